@@ -1,43 +1,935 @@
+import base64
+import contextlib
+import copy
+import fcntl
+import hashlib
+import json
+import os
 from os.path import expanduser
-import requests
-import subprocess
-import toml
+import random
+import socket
+import threading
+import time
 import urlparse
 
 
-class DcosClient:
-    def __init__(self, service_path='acs/api/v1'):
-        core = self._read_configuration()
-        self.token = core.get('dcos_acs_token', '')
-        if not self.token:
+DEFAULT_POOL_SIZE = 10
+# tokens expiring within this many seconds are refreshed proactively
+TOKEN_REFRESH_MARGIN = 300
+MAX_POLL_INTERVAL = 30
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 60
+DEFAULT_MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5
+RETRY_MAX_BACKOFF = 10
+RETRY_STATUS_CODES = (502, 503, 504)
+# only these are retried after the request may have reached the server
+IDEMPOTENT_ACTIONS = ('get', 'put', 'delete')
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_COOLDOWN = 30
+# a broker exits after this many seconds without requests
+BROKER_IDLE_TIMEOUT = 600
+MARATHON_SERVICE_PATH = '/service/marathon/v2'
+LEADER_TTL = 60
+MARATHON_STATUS_FIELDS = ('version', 'versionInfo', 'tasks', 'tasksStaged', 'tasksRunning',
+                          'tasksHealthy', 'tasksUnhealthy', 'deployments', 'lastTaskFailure',
+                          'readinessCheckResults', 'taskStats')
+# maps keyed by the user, a key left out of the definition is removed
+MARATHON_EXACT_FIELDS = ('env', 'labels', 'secrets')
+# port fields where 0 asks marathon to pick any port
+MARATHON_DYNAMIC_PORTS = ('ports', 'port', 'servicePort')
+
+COSMOS_MEDIA_TYPE = 'application/vnd.dcos.package.{action}-{kind}+json;charset=utf-8;version={version}'
+COSMOS_RESPONSE_VERSIONS = {
+    'list': 'v1',
+    'install': 'v2',
+    'uninstall': 'v1',
+}
+
+# parsed dcos.toml files keyed on path, invalidated when the file changes
+_config_cache = {}
+# url templates keyed on (dcos_url, service_path)
+_url_cache = {}
+# auth tokens keyed on config path, or dcos_url and uid for logins
+_token_cache = {}
+# time spent opening connections by the request running in this thread
+_connection_stats = threading.local()
+# classes built on requests, see _requests_classes
+_classes = {}
+
+
+class _LazyModule(object):
+    # imported on first use, requests alone takes longer to import than
+    # most module runs spend on anything else, and tasks answered from a
+    # cache or the broker never need it
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = __import__(self._name)
+        return getattr(self._module, attr)
+
+
+requests = _LazyModule('requests')
+
+
+def config_path():
+    return os.path.join(expanduser("~"), '.dcos', 'dcos.toml')
+
+
+def read_configuration(path=None):
+    path = path or config_path()
+    stat = os.stat(path)
+    signature = (stat.st_mtime, stat.st_size)
+    cached = _config_cache.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+    import toml
+    with open(path) as conffile:
+        try:
+            config = toml.loads(conffile.read())
+        except Exception as e:
+            raise Exception("Error parsing dcos.toml file: " + str(e))
+    core = config.get('core', {})
+    _config_cache[path] = (signature, core)
+    return core
+
+
+def token_expiry(token):
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(str(payload)))['exp']
+    except Exception:
+        return None
+
+
+def token_is_fresh(token, margin=TOKEN_REFRESH_MARGIN):
+    if not token:
+        return False
+    expiry = token_expiry(token)
+    return expiry is None or expiry - margin > time.time()
+
+
+def _read_token_file(cache_file):
+    return _load_state(cache_file, {})
+
+
+def get_cached_token(key, cache_file=None):
+    token = _token_cache.get(key)
+    if not token_is_fresh(token) and cache_file:
+        token = _read_token_file(cache_file).get(key)
+    if not token_is_fresh(token):
+        return None
+    _token_cache[key] = token
+    return token
+
+
+def set_cached_token(key, token, cache_file=None):
+    _token_cache[key] = token
+    if not cache_file:
+        return
+    tokens = _read_token_file(cache_file)
+    tokens[key] = token
+    _save_state(cache_file, tokens)
+
+
+def cosmos_operation(action, body):
+    # a (post, endpoint, body, content_type, accept) operation for a client
+    # created with service_path='/package', usable with DcosClient.batch
+    content_type = COSMOS_MEDIA_TYPE.format(action=action, kind='request', version='v1')
+    accept = COSMOS_MEDIA_TYPE.format(action=action, kind='response',
+                                      version=COSMOS_RESPONSE_VERSIONS[action])
+    return ('post', '/' + action, body, content_type, accept)
+
+
+def cosmos(client, action, body):
+    return client._call(cosmos_operation(action, body))
+
+
+def cosmos_package_name(package):
+    information = package.get('packageInformation', {})
+    return information.get('packageDefinition', {}).get('name')
+
+
+def read_object(client, path, list_path=None, key=None, name=None, cache=True):
+    # read one object, either directly or by picking the item whose key
+    # equals name out of a list response, returns the result and the
+    # object or None if it is missing
+    if list_path:
+        result = client.get(list_path, cache)
+        if result['failed']:
+            return result, None
+        for item in result.get('json', {}).get('array', []):
+            if item.get(key) == name:
+                result['json'] = item
+                return result, item
+        result.pop('json', None)
+        return result, None
+    result = client.get(path, cache)
+    if result['status_code'] in (400, 404):
+        result.update(failed=False, rc=0)
+        result.pop('msg', None)
+        return result, None
+    return result, result.get('json')
+
+
+def fetch_iam_snapshot(client, gids=None, rids=None, concurrency=DEFAULT_POOL_SIZE):
+    # users, groups and acls keyed by uid, gid and rid, with group members
+    # and acl permissions as sets. gids and rids restrict the groups and
+    # acls whose members and permissions are fetched. returns the snapshot
+    # and the list of failed results
+    lists = client.batch([('get', '/users'), ('get', '/groups'), ('get', '/acls')],
+                         concurrency)
+    failures = [r for r in lists if r['failed']]
+    if failures:
+        return None, failures
+    users, groups, acls = [r.get('json', {}).get('array', []) for r in lists]
+    snapshot = {
+        'users': dict((u['uid'], u) for u in users),
+        'groups': dict((g['gid'], g) for g in groups),
+        'acls': dict((a['rid'], a) for a in acls),
+    }
+
+    gids = [gid for gid in (snapshot['groups'] if gids is None else gids)
+            if gid in snapshot['groups']]
+    rids = [rid for rid in (snapshot['acls'] if rids is None else rids)
+            if rid in snapshot['acls']]
+    operations = [('get', '/groups/{}/users'.format(gid)) for gid in gids]
+    operations.extend(('get', '/acls/{}/permissions'.format(rid)) for rid in rids)
+    results = client.batch(operations, concurrency)
+    failures = [r for r in results if r['failed']]
+
+    for gid, result in zip(gids, results[:len(gids)]):
+        snapshot['groups'][gid]['members'] = _members(result.get('json', {}))
+    for rid, result in zip(rids, results[len(gids):]):
+        snapshot['acls'][rid].update(_permissions(result.get('json', {})))
+    return snapshot, failures
+
+
+def _members(data):
+    return set(m['user']['uid'] for m in data.get('array', []))
+
+
+def _permissions(data):
+    permissions = {}
+    for kind, key in (('users', 'uid'), ('groups', 'gid')):
+        permissions[kind] = dict(
+            (entry[key], set(a['name'] for a in entry.get('actions', [])))
+            for entry in data.get(kind, []))
+    return permissions
+
+
+def read_members(client, gid):
+    # the uids in a group, or None if the group is missing
+    result, data = read_object(client, '/groups/{}/users'.format(gid))
+    if result['failed'] or data is None:
+        return result, None
+    return result, _members(data)
+
+
+def read_permissions(client, rid):
+    # the users and groups of an acl mapped to their actions, or None if
+    # the acl is missing
+    result, data = read_object(client, '/acls/{}/permissions'.format(rid))
+    if result['failed'] or data is None:
+        return result, None
+    return result, _permissions(data)
+
+
+def operations_diff(operations):
+    # the requests a bulk module sends, or would send in check mode, one
+    # per line as shown by --diff
+    lines = ['{} {}\n'.format(op[0].upper(), op[1]) for op in operations]
+    return {'prepared': ''.join(lines)}
+
+
+def check_result(before, after, changed=None):
+    # the result of a module in check mode, nothing is written and --diff
+    # shows the state before and after the change that would be made
+    if changed is None:
+        changed = before != after
+    return {
+        'changed': changed,
+        'rc': 0,
+        'failed': False,
+        'diff': {'before': before, 'after': after},
+    }
+
+
+def snapshot_to_json(value):
+    # sets become sorted lists so the snapshot can be returned or saved
+    if isinstance(value, dict):
+        return dict((k, snapshot_to_json(v)) for k, v in value.items())
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, list):
+        return [snapshot_to_json(v) for v in value]
+    return value
+
+
+def load_iam_snapshot(params):
+    # the snapshot given to a module directly or through a file written
+    # by dcos_iam_facts, None when neither is set
+    if params.get('snapshot'):
+        return params['snapshot']
+    if params.get('snapshot_path'):
+        with open(params['snapshot_path']) as f:
+            return json.load(f)
+    return None
+
+
+def snapshot_result():
+    return {
+        'changed': False,
+        'rc': 0,
+        'failed': False,
+        'snapshot': True,
+    }
+
+
+def backoff_delay(attempt, base, cap=MAX_POLL_INTERVAL):
+    # exponential backoff with jitter over the upper half of the interval
+    delay = min(max(cap, base), base * (2 ** attempt))
+    return random.uniform(delay / 2.0, delay)
+
+
+def app_is_ready(app):
+    if app.get('deployments'):
+        return False
+    instances = app.get('instances', 0)
+    if app.get('tasksRunning', 0) < instances:
+        return False
+    if app.get('healthChecks') and app.get('tasksHealthy', 0) < instances:
+        return False
+    return True
+
+
+def wait_for_apps(marathon, app_ids, timeout, poll_interval):
+    # poll marathon until every app is deployed and healthy, returns
+    # whether they all are and the last known app definitions
+    deadline = time.time() + timeout
+    pending = set(app_ids)
+    apps = {}
+    attempt = 0
+    while True:
+        polled = sorted(pending)
+        results = marathon.batch([('get', '/apps{}'.format(app_id), False) for app_id in polled])
+        for app_id, result in zip(polled, results):
+            app = result.get('json', {}).get('app')
+            if result.get('status_code') != 200 or not app:
+                continue
+            apps[app_id] = app
+            if app_is_ready(app):
+                pending.discard(app_id)
+        if not pending:
+            return True, apps
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return False, apps
+        time.sleep(min(remaining, backoff_delay(attempt, poll_interval)))
+        attempt += 1
+
+
+def marathon_id(group_id, app_id):
+    # ids in a group definition may be relative to the group
+    if app_id.startswith('/'):
+        return app_id.rstrip('/')
+    return '{}/{}'.format(group_id.rstrip('/'), app_id.strip('/'))
+
+
+def marathon_definition(app):
+    # an app as read from marathon without its status fields
+    if app is None:
+        return None
+    return dict((k, v) for k, v in app.items() if k not in MARATHON_STATUS_FIELDS)
+
+
+def definition_differs(desired, current, field=None):
+    # only the fields given in the desired definition are compared,
+    # marathon fills in defaults for the others
+    if field in MARATHON_EXACT_FIELDS:
+        return desired != current
+    if field in MARATHON_DYNAMIC_PORTS and desired == 0:
+        return not isinstance(current, (int, long))
+    if isinstance(desired, dict):
+        if not isinstance(current, dict):
+            return True
+        return any(definition_differs(v, current.get(k), k) for k, v in desired.items())
+    if isinstance(desired, list):
+        if not isinstance(current, list) or len(desired) != len(current):
+            return True
+        return any(definition_differs(d, c, field) for d, c in zip(desired, current))
+    return desired != current
+
+
+def _timed_connection(cls):
+    class TimedConnection(cls):
+        def connect(self):
+            start = time.time()
+            cls.connect(self)
+            _connection_stats.connect += time.time() - start
+            _connection_stats.connections += 1
+    return TimedConnection
+
+
+def _requests_classes():
+    # the classes built on requests are defined when the first session or
+    # error needs them, not when the module is imported
+    if _classes:
+        return _classes
+    from requests.adapters import HTTPAdapter
+    from requests.packages.urllib3 import connectionpool
+
+    class TimedHTTPConnectionPool(connectionpool.HTTPConnectionPool):
+        ConnectionCls = _timed_connection(connectionpool.HTTPConnectionPool.ConnectionCls)
+
+    class TimedHTTPSConnectionPool(connectionpool.HTTPSConnectionPool):
+        ConnectionCls = _timed_connection(connectionpool.HTTPSConnectionPool.ConnectionCls)
+
+    class TimingAdapter(HTTPAdapter):
+        # records how long new connections (dns, tcp and tls) take to open
+        def init_poolmanager(self, *args, **kwargs):
+            HTTPAdapter.init_poolmanager(self, *args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                'http': TimedHTTPConnectionPool,
+                'https': TimedHTTPSConnectionPool,
+            }
+
+    class CircuitOpenError(requests.RequestException):
+        pass
+
+    _classes['TimingAdapter'] = TimingAdapter
+    _classes['CircuitOpenError'] = CircuitOpenError
+    return _classes
+
+
+def _create_session(pool_size=DEFAULT_POOL_SIZE):
+    session = requests.Session()
+    adapter = _requests_classes()['TimingAdapter'](pool_connections=pool_size,
+                                                   pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['Connection'] = 'keep-alive'
+    return session
+
+
+def login_credentials():
+    uid = os.environ.get('DCOS_UID')
+    if not uid:
+        return None
+    credentials = {'uid': uid}
+    key_path = os.environ.get('DCOS_PRIVATE_KEY_PATH')
+    if key_path:
+        with open(key_path) as keyfile:
+            credentials['private_key'] = keyfile.read()
+    else:
+        credentials['password'] = os.environ.get('DCOS_PASSWORD', '')
+    return credentials
+
+
+def _service_login_token(uid, private_key):
+    try:
+        import jwt
+    except ImportError:
+        raise Exception("PyJWT and cryptography are required for service account login")
+    claims = {'uid': uid, 'exp': int(time.time()) + TOKEN_REFRESH_MARGIN}
+    return jwt.encode(claims, private_key, algorithm='RS256')
+
+
+def _state_dir():
+    # per user, so other local users can neither read nor plant state
+    path = os.path.join(expanduser("~"), '.dcos', 'state')
+    if not os.path.isdir(path):
+        try:
+            os.makedirs(path, 0700)
+        except OSError:
+            pass
+    return path
+
+
+def _state_path(kind, url):
+    # a file shared by the module processes of this user talking to the
+    # cluster at url
+    digest = hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(_state_dir(), '{}-{}.json'.format(kind, digest))
+
+
+def _load_state(path, default):
+    # only regular files owned by the current user are trusted
+    try:
+        fd = os.open(path, os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0))
+    except OSError:
+        return default
+    with os.fdopen(fd) as f:
+        if os.fstat(fd).st_uid != os.getuid():
+            return default
+        try:
+            state = json.load(f)
+        except ValueError:
+            return default
+    return state if isinstance(state, dict) else default
+
+
+def _save_state(path, state):
+    tmp = '{}.{}.{}'.format(path, os.getpid(), threading.current_thread().ident)
+    try:
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(state, f)
+        os.rename(tmp, path)
+    except (IOError, OSError):
+        pass
+
+
+def cached_marathon_leader(dcos_url, ttl=LEADER_TTL):
+    state = _load_state(_state_path('marathon-leader', dcos_url), {})
+    resolved_at = state.get('resolved_at')
+    if not state.get('leader') or not isinstance(resolved_at, (int, float)):
+        return None
+    # a leader resolved in the future was not written by this clock
+    if 0 <= time.time() - resolved_at < ttl:
+        return state['leader']
+    return None
+
+
+def cache_marathon_leader(dcos_url, leader):
+    _save_state(_state_path('marathon-leader', dcos_url),
+                {'leader': leader, 'resolved_at': time.time()})
+
+
+def forget_marathon_leader(dcos_url):
+    try:
+        os.remove(_state_path('marathon-leader', dcos_url))
+    except OSError:
+        pass
+
+
+@contextlib.contextmanager
+def _state_lock(path):
+    # serializes read-modify-write of a state file across processes, or
+    # does nothing when the lock file can not be created
+    try:
+        fd = os.open(path + '.lock', os.O_WRONLY | os.O_CREAT, 0600)
+    except OSError:
+        yield
+        return
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+class CircuitBreaker:
+    # counts consecutive errors per cluster in a file shared by all module
+    # processes of the user, and refuses requests for cooldown seconds once
+    # threshold errors happened in a row
+    def __init__(self, url, threshold=CIRCUIT_FAILURE_THRESHOLD,
+                 cooldown=CIRCUIT_COOLDOWN):
+        self.path = _state_path('circuit', url)
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+
+    def _load(self):
+        # read on every use, other processes update the file too
+        state = _load_state(self.path, {})
+        failures = state.get('failures')
+        opened_at = state.get('opened_at')
+        if not isinstance(failures, int):
+            failures = 0
+        # an opening in the future was not written by this clock
+        if not isinstance(opened_at, (int, float)) or opened_at > time.time():
+            opened_at = None
+        return {'failures': failures, 'opened_at': opened_at}
+
+    def allow(self):
+        opened_at = self._load()['opened_at']
+        return not opened_at or time.time() - opened_at >= self.cooldown
+
+    def record(self, success):
+        if success and not self._load()['failures']:
+            return
+        with self.lock:
+            with _state_lock(self.path):
+                state = self._load()
+                if success:
+                    state = {'failures': 0, 'opened_at': None}
+                else:
+                    state['failures'] += 1
+                    if state['failures'] >= self.threshold:
+                        state['opened_at'] = time.time()
+                _save_state(self.path, state)
+
+
+class ResponseCache:
+    # on disk cache of GET responses, one 0600 file per url and token,
+    # revalidated with ETag/Last-Modified or served for ttl seconds when
+    # the server sends neither, evicted least recently used first. A write
+    # stamps the scope it changes, e.g. all of /acls, and entries of that
+    # scope stored before the stamp are no longer used
+    def __init__(self, path, ttl=0, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        if not os.path.isdir(path):
+            os.makedirs(path, 0700)
+
+    def _entry_path(self, url, token):
+        token_id = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        key = hashlib.sha256(u'{} {}'.format(url, token_id).encode('utf-8')).hexdigest()
+        return os.path.join(self.path, key + '.json')
+
+    def _stamp_path(self, scope):
+        key = hashlib.sha256(scope.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, key + '.stamp')
+
+    def written_at(self, scope):
+        written_at = _load_state(self._stamp_path(scope), {}).get('written_at')
+        return written_at if isinstance(written_at, (int, float)) else 0
+
+    def invalidate(self, scope):
+        _save_state(self._stamp_path(scope), {'written_at': time.time()})
+
+    def load(self, url, token, scope):
+        path = self._entry_path(url, token)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (IOError, ValueError):
+            return None
+        if entry['stored_at'] <= self.written_at(scope):
+            return None
+        os.utime(path, None)
+        return entry
+
+    def is_fresh(self, entry):
+        if entry.get('etag') or entry.get('last_modified'):
+            return False
+        return time.time() - entry['stored_at'] < self.ttl
+
+    def store(self, url, token, response, requested_at):
+        # stored as of when it was requested, so a write finishing while
+        # the response was on its way still invalidates it
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not (etag or last_modified or self.ttl):
+            return
+        entry = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'stored_at': requested_at,
+            'status_code': response.status_code,
+            'text': response.text,
+        }
+        path = self._entry_path(url, token)
+        tmp = '{}.{}'.format(path, os.getpid())
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry, f)
+        os.rename(tmp, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.path):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.path, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
             try:
-                result = subprocess.check_output("dcos auth login".split())
-            except Exception as e:
-                print result
-                raise e
-            core = self._read_configuration()
-            self.token = core.get('dcos_acs_token', 'bogus')
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def response(self, entry):
+        response = requests.Response()
+        response.status_code = entry['status_code']
+        response.encoding = 'utf-8'
+        response._content = entry['text'].encode('utf-8')
+        response.url = entry['url']
+        return response
+
+
+def _env_number(name, default, kind=float):
+    # a number from the environment, so users can tune the client
+    value = os.environ.get(name)
+    return kind(value) if value else default
+
+
+def response_cache():
+    # the response cache is opt in through DCOS_HTTP_CACHE_DIR
+    path = os.environ.get('DCOS_HTTP_CACHE_DIR')
+    if not path:
+        return None
+    ttl = float(os.environ.get('DCOS_HTTP_CACHE_TTL', 0))
+    max_bytes = int(os.environ.get('DCOS_HTTP_CACHE_MAX_BYTES', DEFAULT_CACHE_MAX_BYTES))
+    return ResponseCache(path, ttl, max_bytes)
+
+
+def broker_socket():
+    # the broker is opt in through DCOS_BROKER_SOCKET
+    return os.environ.get('DCOS_BROKER_SOCKET')
+
+
+def broker_message(path, message):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        stream = sock.makefile('rwb')
+        stream.write(json.dumps(message) + '\n')
+        stream.flush()
+        line = stream.readline()
+    except socket.error as e:
+        raise requests.ConnectionError('DC/OS broker at {}: {}'.format(path, e))
+    finally:
+        sock.close()
+    if not line:
+        raise requests.ConnectionError('DC/OS broker at {} closed the connection'.format(path))
+    return json.loads(line)
+
+
+def broker_alive(path):
+    # the answer of the broker at path to a ping, None if there is none
+    try:
+        pong = broker_message(path, {'control': 'ping'})
+    except (requests.ConnectionError, ValueError):
+        return None
+    return pong if pong.get('pong') else None
+
+
+class DcosClient:
+    def __init__(self, service_path='acs/api/v1',
+                 pool_size=DEFAULT_POOL_SIZE, max_retries=None,
+                 config=None, config_path=None, credentials=None,
+                 cache=None, connect_timeout=None, read_timeout=None, broker=True):
+        self.config_path = config_path
+        self.cache = cache if cache is not None else response_cache()
         self.service_path = service_path
-        self.url = self._parse_url(core.get('dcos_url', ''))
+        self.leader_url = None
+        # timings of every request, shared with the for_service clients
+        self.perf = []
+        # requests for the default configuration go through a running
+        # broker, which holds the token and the connection pool, and
+        # tells which cluster it talks to so dcos.toml is not read
+        self.broker = None
+        if broker and config is None and config_path is None and credentials is None:
+            path = broker_socket()
+            pong = path and broker_alive(path)
+            if pong and 'dcos_url' in pong:
+                self.broker = path
+                self.dcos_url = pong['dcos_url']
+                self.url = self._parse_url(self.dcos_url)
+                self.token = ''
+                return
+        core = config if config is not None else self._read_configuration()
+        self.dcos_url = core.get('dcos_url', '')
+        self.url = self._parse_url(self.dcos_url)
         ssl_verify = str(core.get('ssl_verify', "true")).lower()
         self.ssl_verify = ssl_verify in ['true', 'yes']
+        self.token = core.get('dcos_acs_token', '')
+        self.session = _create_session(pool_size)
+        # defaults can be overridden in the environment of the modules
+        if max_retries is None:
+            max_retries = _env_number('DCOS_MAX_RETRIES', DEFAULT_MAX_RETRIES, int)
+        if connect_timeout is None:
+            connect_timeout = _env_number('DCOS_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT)
+        if read_timeout is None:
+            read_timeout = _env_number('DCOS_READ_TIMEOUT', DEFAULT_READ_TIMEOUT)
+        self.max_retries = max_retries
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = CircuitBreaker(
+            self.dcos_url,
+            _env_number('DCOS_CIRCUIT_THRESHOLD', CIRCUIT_FAILURE_THRESHOLD, int),
+            _env_number('DCOS_CIRCUIT_COOLDOWN', CIRCUIT_COOLDOWN))
+        self.credentials = credentials
+        self.token_lock = threading.Lock()
+        self.token_renewed = False
+        if not token_is_fresh(self.token):
+            self.token = self._login()
 
-    def _read_configuration(self):
-        home = expanduser("~")
-        with open("{}/.dcos/dcos.toml".format(home)) as conffile:
+    def _login(self, cached=True):
+        credentials = self.credentials or login_credentials()
+        if not credentials:
+            return self._cli_login()
+        # shared with the other clients and module runs of this user
+        key = '{} {}'.format(self.dcos_url, credentials['uid'])
+        cache_file = os.path.join(_state_dir(), 'tokens.json')
+        token = get_cached_token(key, cache_file) if cached else None
+        if not token:
+            token = self.login(credentials)
+            set_cached_token(key, token, cache_file)
+        return token
+
+    def _renew_token(self, rejected):
+        # the token was revoked, the password changed or the cluster was
+        # reinstalled: log in again, once per client
+        with self.token_lock:
+            if rejected != 'token={}'.format(self.token):
+                # renewed by another thread in the meantime
+                return True
+            if self.token_renewed:
+                return False
+            self.token_renewed = True
+            self.token = self._login(cached=False)
+            return True
+
+    def _request(self, action, url, endpoint=None, retries=None, renew=True, **kwargs):
+        # send a request and record its timings in self.perf
+        _connection_stats.connect = 0.0
+        _connection_stats.connections = 0
+        record = {
+            'action': action,
+            'service': self.service_path,
+            'endpoint': endpoint,
+            'retries': 0,
+        }
+        start = time.time()
+        try:
+            response = self._retry(action, url, record, retries, **kwargs)
+        except requests.RequestException as e:
+            record['error'] = str(e)
+            raise
+        finally:
+            record['total'] = time.time() - start
+            record['connect'] = _connection_stats.connect
+            record['new_connections'] = _connection_stats.connections
+            self.perf.append(record)
+        record['status_code'] = response.status_code
+        record['server'] = response.elapsed.total_seconds()
+        record['bytes_sent'] = len(response.request.body or '')
+        record['bytes_received'] = len(response.content)
+        headers = kwargs.get('headers') or {}
+        if response.status_code == 401 and renew and 'Authorization' in headers and \
+                self._renew_token(headers['Authorization']):
+            kwargs['headers'] = dict(headers, Authorization='token={}'.format(self.token))
+            return self._request(action, url, endpoint, retries, renew=False, **kwargs)
+        return response
+
+    def _retry(self, action, url, record, retries, **kwargs):
+        # send a request with timeouts, retrying connect errors and, for
+        # idempotent actions, read errors and 502/503/504 with backoff
+        if not self.breaker.allow():
+            raise _requests_classes()['CircuitOpenError']('Too many errors from {}, not sending requests for {} seconds'.format(
+                self.dcos_url, self.breaker.cooldown))
+        max_retries = self.max_retries if retries is None else retries
+        retries = max_retries if action in IDEMPOTENT_ACTIONS else 0
+        attempt = 0
+        while True:
+            error = None
+            record['retries'] = attempt
             try:
-                config = toml.loads(conffile.read())
-                return config.get('core', {})
-            except Exception as e:
-                raise Exception("Error parsing dcos.toml file: " + str(e))
+                response = self.session.request(action, url, verify=self.ssl_verify,
+                                                timeout=self.timeout, **kwargs)
+            except requests.exceptions.ConnectTimeout as e:
+                # the request never reached the server
+                error, retryable = e, attempt < max_retries
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error, retryable = e, attempt < retries
+            else:
+                if response.status_code not in RETRY_STATUS_CODES:
+                    self.breaker.record(True)
+                    return response
+                retryable = attempt < retries
+            if not retryable:
+                # one error per request once its retries are used up, so
+                # a short outage during a batch does not open the circuit
+                self.breaker.record(False)
+                if error:
+                    raise error
+                return response
+            time.sleep(backoff_delay(attempt, RETRY_BACKOFF, RETRY_MAX_BACKOFF))
+            attempt += 1
+
+    def _cli_login(self):
+        import subprocess
+        try:
+            result = subprocess.check_output("dcos auth login".split())
+        except Exception as e:
+            print result
+            raise e
+        core = self._read_configuration()
+        return core.get('dcos_acs_token', 'bogus')
+
+    def login(self, credentials):
+        body = {'uid': credentials['uid']}
+        if credentials.get('private_key'):
+            body['token'] = _service_login_token(credentials['uid'],
+                                                 credentials['private_key'])
+        else:
+            body['password'] = credentials.get('password', '')
+        result = urlparse.urlsplit(self.dcos_url)
+        result = result._replace(netloc=result.netloc.split('@')[-1],
+                                 path='/acs/api/v1/auth/login')
+        url = urlparse.urlunsplit(result)
+        response = self._request('post', url, '/auth/login', json=body,
+                                 headers={'Content-Type': 'application/json'})
+        if response.status_code != 200:
+            raise Exception("Error logging in to DC/OS as {}: {}".format(
+                credentials['uid'], response.text))
+        return response.json()['token']
+
+    def _read_configuration(self):
+        return read_configuration(self.config_path)
+
+    def for_service(self, service_path):
+        # a client for another service sharing the token and connection pool
+        client = copy.copy(self)
+        client.service_path = service_path
+        client.url = client._parse_url(self.dcos_url)
+        return client
+
+    def marathon_leader(self, ttl=LEADER_TTL):
+        leader = cached_marathon_leader(self.dcos_url, ttl)
+        if leader:
+            return leader
+        result = self.for_service(MARATHON_SERVICE_PATH).get('/leader', cache=False)
+        if result['failed']:
+            return None
+        leader = result.get('json', {}).get('leader')
+        if leader:
+            cache_marathon_leader(self.dcos_url, leader)
+        return leader
+
+    def marathon(self, direct=False, ttl=LEADER_TTL, insecure=False):
+        # a marathon client, sending writes straight to the leader if direct.
+        # The token is only sent over plain http to a leader not listening
+        # on 8443 when insecure, otherwise writes go through adminrouter
+        client = self.for_service(MARATHON_SERVICE_PATH)
+        if direct:
+            leader = self.marathon_leader(ttl)
+            if leader and leader.endswith(':8443'):
+                client.leader_url = 'https://{}/v2{{endpoint}}'.format(leader)
+            elif leader and insecure:
+                client.leader_url = 'http://{}/v2{{endpoint}}'.format(leader)
+        return client
 
     def _parse_url(self, url):
+        key = (url, self.service_path)
+        if key in _url_cache:
+            return _url_cache[key]
         result = urlparse.urlsplit(url)
         netloc = result.netloc.split('@')[-1]
         result = result._replace(netloc=netloc)
         path = self.service_path + "{endpoint}"
         result = result._replace(path=path)
-        return urlparse.urlunsplit(result)
+        _url_cache[key] = urlparse.urlunsplit(result)
+        return _url_cache[key]
 
     def _get_headers(self):
         return {
@@ -65,18 +957,112 @@ class DcosClient:
             result['json'] = response.json()
         except Exception:
             pass
+        result['perf'] = self.perf
+        return result
+
+    def _forward(self, action, endpoint, *args):
+        response = broker_message(self.broker, {
+            'service_path': self.service_path,
+            'leader_url': self.leader_url,
+            'action': action,
+            'endpoint': endpoint,
+            'args': args,
+        })
+        if 'error' in response:
+            raise requests.RequestException(response['error'])
+        self.leader_url = response.get('leader_url')
+        result = response['result']
+        self.perf.extend(result.get('perf', []))
+        result['perf'] = self.perf
         return result
 
-    def get(self, endpoint):
+    def get(self, endpoint, cache=True):
+        # cache=False always asks the server, for reads that poll
+        if self.broker:
+            return self._forward('get', endpoint, cache)
         headers = self._get_headers()
         url = self.url.format(endpoint=endpoint)
-        response = requests.get(url, headers=headers, verify=self.ssl_verify)
+        if not self.cache or not cache:
+            response = self._request('get', url, endpoint, headers=headers)
+            return self._result_create(response, url, headers, 'get')
+
+        scope = self._cache_scope(endpoint)
+        entry = self.cache.load(url, self.token, scope)
+        if entry and self.cache.is_fresh(entry):
+            result = self._result_create(self.cache.response(entry), url, headers, 'get')
+            result['cached'] = True
+            return result
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        requested_at = time.time()
+        response = self._request('get', url, endpoint, headers=headers)
+        if response.status_code == 304 and entry:
+            result = self._result_create(self.cache.response(entry), url, headers, 'get')
+            result['cached'] = True
+            return result
+        if response.status_code == 200:
+            self.cache.store(url, self.token, response, requested_at)
         return self._result_create(response, url, headers, 'get')
 
+    def _send(self, action, endpoint, **kwargs):
+        # the cache is invalidated once the write is done, or may be, so
+        # no read sent before it finished stays cached
+        try:
+            return self._send_write(action, endpoint, **kwargs)
+        finally:
+            self._invalidate(endpoint)
+
+    def _send_write(self, action, endpoint, **kwargs):
+        # writes go to the marathon leader when it is known, falling back
+        # to adminrouter on redirects and errors
+        if self.leader_url:
+            url = self.leader_url.format(endpoint=endpoint)
+            try:
+                response = self._request(action, url, endpoint, retries=0,
+                                         allow_redirects=False, **kwargs)
+                if response.status_code < 300 or 400 <= response.status_code < 500:
+                    return url, response
+            except requests.RequestException:
+                pass
+            self.leader_url = None
+            forget_marathon_leader(self.dcos_url)
+        url = self.url.format(endpoint=endpoint)
+        return url, self._request(action, url, endpoint, **kwargs)
+
+    def _cache_scope(self, endpoint):
+        # the cached reads a write to endpoint may change: its collection,
+        # e.g. /acls for a permission or /secret for any secret, or all of
+        # marathon, whose apps also show up in its groups
+        if self.service_path == MARATHON_SERVICE_PATH:
+            return self.url.format(endpoint='')
+        collection = endpoint.lstrip('/').split('?')[0].split('/')[0]
+        return self.url.format(endpoint='/' + collection)
+
+    def _invalidate(self, endpoint):
+        if self.cache:
+            self.cache.invalidate(self._cache_scope(endpoint))
+            if self.service_path == '/package':
+                # packages are installed and removed as marathon apps
+                self.cache.invalidate(self.for_service(MARATHON_SERVICE_PATH)._cache_scope(''))
+
+    def post(self, endpoint, body={}, content_type=None, accept=None):
+        if self.broker:
+            return self._forward('post', endpoint, body, content_type, accept)
+        headers = self._get_headers()
+        if content_type:
+            headers['Content-Type'] = content_type
+        if accept:
+            headers['Accept'] = accept
+        url, response = self._send('post', endpoint, json=body, headers=headers)
+        return self._result_create(response, url, headers, 'post', body)
+
     def put(self, endpoint, body={}):
+        if self.broker:
+            return self._forward('put', endpoint, body)
         headers = self._get_headers()
-        url = self.url.format(endpoint=endpoint)
-        response = requests.put(url, json=body, headers=headers, verify=self.ssl_verify)
+        url, response = self._send('put', endpoint, json=body, headers=headers)
         result = self._result_create(response, url, headers, 'put', body)
         if result['status_code'] == 201:
             result['changed'] = True
@@ -85,18 +1071,20 @@ class DcosClient:
         return result
 
     def patch(self, endpoint, body={}):
+        if self.broker:
+            return self._forward('patch', endpoint, body)
         headers = self._get_headers()
-        url = self.url.format(endpoint=endpoint)
-        response = requests.patch(url, json=body, headers=headers, verify=self.ssl_verify)
+        url, response = self._send('patch', endpoint, json=body, headers=headers)
         result = self._result_create(response, url, headers, 'patch', body)
         if result['status_code'] == 204:
             result['changed'] = True
         return result
 
     def delete(self, endpoint):
+        if self.broker:
+            return self._forward('delete', endpoint)
         headers = self._get_headers()
-        url = self.url.format(endpoint=endpoint)
-        response = requests.delete(url, headers=headers, verify=self.ssl_verify)
+        url, response = self._send('delete', endpoint, headers=headers)
         result = self._result_create(response, url, headers, 'delete')
         if result['status_code'] < 300:
             result['changed'] = True
@@ -105,3 +1093,34 @@ class DcosClient:
             result['failed'] = False
             result.pop('debug', None)
         return result
+
+    def _call(self, operation):
+        action, endpoint = operation[0], operation[1]
+        try:
+            result = getattr(self, action)(endpoint, *operation[2:])
+            # the timings of a batch are reported once, by the caller
+            result.pop('perf', None)
+            return result
+        except requests.RequestException as e:
+            return {
+                'changed': False,
+                'rc': 1,
+                'failed': True,
+                'request_action': action,
+                'request_url': self.url.format(endpoint=endpoint),
+                'msg': str(e),
+            }
+
+    def batch(self, operations, concurrency=DEFAULT_POOL_SIZE):
+        # operations are (action, endpoint[, body]) tuples, results are
+        # returned in the same order
+        operations = list(operations)
+        if len(operations) < 2 or concurrency < 2:
+            return [self._call(operation) for operation in operations]
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(min(concurrency, len(operations)))
+        try:
+            return pool.map(self._call, operations)
+        finally:
+            pool.close()
+
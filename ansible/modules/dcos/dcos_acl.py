@@ -35,7 +35,7 @@ EXAMPLES = '''
      state: absent
 '''
 
-from ansible.module_utils.basic import *
+from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils import dcos
 
 
@@ -60,6 +60,20 @@ def dcos_acl_present(params):
     module.exit_json(**result)
 
 
+def dcos_acl_check(params):
+    client = dcos.DcosClient()
+    result, acl = dcos.read_object(client, '/acls/{}'.format(params['rid']))
+    if result['failed']:
+        module.fail_json(**result)
+    before = {}
+    if acl is not None:
+        before = {'rid': params['rid'], 'description': acl.get('description')}
+    after = {}
+    if params['state'] == 'present':
+        after = {'rid': params['rid'], 'description': params['description']}
+    module.exit_json(perf=client.perf, **dcos.check_result(before, after))
+
+
 def main():
     global module
     module = AnsibleModule(argument_spec={
@@ -71,11 +85,13 @@ def main():
             'default': 'present',
             'choices': [ 'present', 'absent' ]
         },
-    })
-    if module.params['state'] == 'present':
-        if (module.params['description']):
-            dcos_acl_present(module.params)
+    }, supports_check_mode=True)
+    if module.params['state'] == 'present' and not module.params['description']:
         module.fail_json(msg="Description required for state=present", rc=1)
+    if module.check_mode:
+        dcos_acl_check(module.params)
+    if module.params['state'] == 'present':
+        dcos_acl_present(module.params)
     dcos_acl_absent(module.params)
 
 
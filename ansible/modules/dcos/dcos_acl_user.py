@@ -17,6 +17,16 @@ options:
         description:
             - Permission on the resource e.g. read, full, ...
         required: false
+    snapshot:
+        description:
+            - IAM snapshot gathered by C(dcos_iam_facts). When it shows that
+            nothing needs to change the module returns without contacting
+            the cluster.
+        required: false
+    snapshot_path:
+        description:
+            - Path of a snapshot written by C(dcos_iam_facts) with C(dest).
+        required: false
     state:
         description:
             - If C(present), add the permission to the resource.
@@ -41,7 +51,7 @@ EXAMPLES = '''
      state: absent
 '''
 
-from ansible.module_utils.basic import *
+from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils import dcos
 
 
@@ -62,19 +72,55 @@ def dcos_acl_user_present(params):
     module.exit_json(**result)
 
 
+def dcos_acl_user_check(params, snapshot):
+    acl = snapshot['acls'].get(params['rid'], {'users': {}, 'groups': {}}) if snapshot else {}
+    if 'users' in acl:
+        permissions = acl
+        result = {}
+    else:
+        client = dcos.DcosClient()
+        result, permissions = dcos.read_permissions(client, params['rid'])
+        if result['failed']:
+            module.fail_json(**result)
+        permissions = permissions or {}
+        result = {'perf': client.perf}
+    actions = set(permissions.get('users', {}).get(params['uid'], []))
+    if params['state'] == 'present':
+        wanted = actions | set([params['permission']])
+    else:
+        wanted = actions - set([params['permission']])
+    before = {'rid': params['rid'], 'uid': params['uid'], 'permissions': sorted(actions)}
+    after = {'rid': params['rid'], 'uid': params['uid'], 'permissions': sorted(wanted)}
+    result.update(dcos.check_result(before, after))
+    module.exit_json(**result)
+
+
+def _unchanged_in_snapshot(params, snapshot):
+    acl = snapshot['acls'].get(params['rid'], {})
+    granted = params['permission'] in acl.get('users', {}).get(params['uid'], [])
+    return granted == (params['state'] == 'present')
+
+
 def main():
     global module
     module = AnsibleModule(argument_spec={
         'rid': { 'type': 'str', 'required': True },
         'uid': { 'type': 'str', 'required': True },
         'permission': { 'type': 'str', 'required': True },
+        'snapshot': { 'type': 'dict', 'required': False },
+        'snapshot_path': { 'type': 'path', 'required': False },
         'state': {
             'type': 'str',
             'required': False,
             'default': 'present',
             'choices': [ 'present', 'absent' ]
         },
-    })
+    }, supports_check_mode=True)
+    snapshot = dcos.load_iam_snapshot(module.params)
+    if module.check_mode:
+        dcos_acl_user_check(module.params, snapshot)
+    if snapshot and _unchanged_in_snapshot(module.params, snapshot):
+        module.exit_json(**dcos.snapshot_result())
     if module.params['state'] == 'present':
         dcos_acl_user_present(module.params)
         module.fail_json(msg="Description required for state=present", rc=1)
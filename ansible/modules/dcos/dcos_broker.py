@@ -0,0 +1,209 @@
+#!/usr/bin/python
+
+DOCUMENTATION = '''
+---
+module: dcos_broker
+short_description: Start or stop a local DCOS request broker
+description:
+    - Start a background process listening on a unix socket that holds a
+      logged in DCOS client and its connection pool. Modules run with
+      C(DCOS_BROKER_SOCKET) set to the socket send their requests through
+      it instead of authenticating and connecting themselves. The broker
+      uses the default C(~/.dcos/dcos.toml) and exits on its own after
+      C(idle_timeout) seconds without requests.
+options:
+    path:
+        description:
+            - Path of the unix socket.
+        required: false
+        default: ~/.dcos/broker.sock
+    idle_timeout:
+        description:
+            - Seconds without requests after which the broker exits.
+        required: false
+        default: 600
+    pool_size:
+        description:
+            - Maximum number of connections the broker keeps open.
+        required: false
+        default: 10
+    state:
+        description:
+            - If C(started), ensure the broker is running. If C(stopped),
+            ensure it is not.
+        required: false
+        default: started
+        choices: [ started, stopped ]
+'''
+
+EXAMPLES = '''
+- hosts: localhost
+  environment:
+    DCOS_BROKER_SOCKET: "{{ ansible_env.HOME }}/.dcos/broker.sock"
+  tasks:
+    - name: Start the broker
+      dcos_broker:
+
+    - name: Create users through the broker
+      dcos_user:
+         uid: "{{ item.uid }}"
+         password: "{{ item.password }}"
+         description: "{{ item.description }}"
+      with_items: "{{ users }}"
+
+    - name: Stop the broker
+      dcos_broker:
+        state: stopped
+'''
+
+import json
+import os
+import SocketServer
+import threading
+import time
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils import dcos
+
+
+class _BrokerHandler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        response = self.server.dispatch(json.loads(line))
+        self.wfile.write(json.dumps(response) + '\n')
+
+
+class Broker(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    # serves requests forwarded by the modules over a unix socket with one
+    # warm DcosClient, recreated when the configuration changes or the
+    # token is about to expire, and exits after idle_timeout seconds
+    # without requests
+    daemon_threads = True
+
+    def __init__(self, path, idle_timeout=dcos.BROKER_IDLE_TIMEOUT, pool_size=dcos.DEFAULT_POOL_SIZE):
+        if os.path.exists(path):
+            os.remove(path)
+        umask = os.umask(0077)
+        try:
+            SocketServer.UnixStreamServer.__init__(self, path, _BrokerHandler)
+        finally:
+            os.umask(umask)
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.pool_size = pool_size
+        self.lock = threading.Lock()
+        self.client = None
+        self.core = None
+        self.stopped = False
+        self.last_used = time.time()
+
+    def _client(self):
+        with self.lock:
+            core = dcos.read_configuration()
+            if self.client is None or core is not self.core or \
+                    not dcos.token_is_fresh(self.client.token):
+                self.client = dcos.DcosClient(pool_size=self.pool_size, broker=False)
+                self.core = core
+            return self.client
+
+    def dispatch(self, message):
+        self.last_used = time.time()
+        control = message.get('control')
+        if control == 'ping':
+            try:
+                return {'pong': True, 'dcos_url': dcos.read_configuration().get('dcos_url', '')}
+            except Exception:
+                # the client reads dcos.toml itself and reports the error
+                return {'pong': True}
+        if control == 'stop':
+            self.stopped = True
+            return {'stopped': True}
+        try:
+            client = self._client().for_service(message['service_path'])
+            client.perf = []
+            client.leader_url = message.get('leader_url')
+            result = getattr(client, message['action'])(message['endpoint'], *message['args'])
+        except Exception as e:
+            return {'error': str(e)}
+        result['perf'] = client.perf
+        return {'result': result, 'leader_url': client.leader_url}
+
+    def serve(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            while not self.stopped and time.time() - self.last_used < self.idle_timeout:
+                time.sleep(0.5)
+        finally:
+            self.shutdown()
+            self.server_close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def _daemonize(params):
+    # double fork so the broker outlives the module and is not a zombie
+    pid = os.fork()
+    if pid:
+        os.waitpid(pid, 0)
+        return
+    os.setsid()
+    if os.fork():
+        os._exit(0)
+    os.chdir('/')
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    try:
+        Broker(params['path'], params['idle_timeout'], params['pool_size']).serve()
+    finally:
+        os._exit(0)
+
+
+def dcos_broker_started(params):
+    if dcos.broker_alive(params['path']):
+        module.exit_json(changed=False, rc=0, failed=False, path=params['path'])
+    if module.check_mode:
+        module.exit_json(changed=True, rc=0, failed=False, path=params['path'])
+    # fail here rather than in the background on a bad configuration
+    dcos.read_configuration()
+    _daemonize(params)
+    deadline = time.time() + 10
+    while not dcos.broker_alive(params['path']):
+        if time.time() > deadline:
+            module.fail_json(msg='Broker did not start', path=params['path'], rc=1)
+        time.sleep(0.1)
+    module.exit_json(changed=True, rc=0, failed=False, path=params['path'])
+
+
+def dcos_broker_stopped(params):
+    if not dcos.broker_alive(params['path']):
+        module.exit_json(changed=False, rc=0, failed=False, path=params['path'])
+    if module.check_mode:
+        module.exit_json(changed=True, rc=0, failed=False, path=params['path'])
+    dcos.broker_message(params['path'], {'control': 'stop'})
+    module.exit_json(changed=True, rc=0, failed=False, path=params['path'])
+
+
+def main():
+    global module
+    module = AnsibleModule(argument_spec={
+        'path': { 'type': 'path', 'required': False, 'default': '~/.dcos/broker.sock' },
+        'idle_timeout': { 'type': 'int', 'required': False, 'default': 600 },
+        'pool_size': { 'type': 'int', 'required': False, 'default': 10 },
+        'state': {
+            'type': 'str',
+            'required': False,
+            'default': 'started',
+            'choices': [ 'started', 'stopped' ]
+        },
+    }, supports_check_mode=True)
+    if module.params['state'] == 'started':
+        dcos_broker_started(module.params)
+    dcos_broker_stopped(module.params)
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,31 @@ options:
         description:
             - Optional group description during group creation.
         required: false
+    strategy:
+        description:
+            - With C(put_first), try to create the group and fall back to
+            patching it on conflict. With C(read_first), read the group
+            once and send only the one write needed, if any.
+            Defaults to C(put_first).
+        required: false
+        default: put_first
+        choices: [ put_first, read_first ]
+    prefetch:
+        description:
+            - With C(strategy=read_first), look the group up in the C(/groups)
+            list instead of reading it directly, see C(dcos_user).
+        required: false
+        default: false
+    snapshot:
+        description:
+            - IAM snapshot gathered by C(dcos_iam_facts). When it shows that
+            nothing needs to change the module returns without contacting
+            the cluster.
+        required: false
+    snapshot_path:
+        description:
+            - Path of a snapshot written by C(dcos_iam_facts) with C(dest).
+        required: false
     state:
         description:
             - If C(present), ensure the group exists. If C(absent),
@@ -34,7 +59,7 @@ EXAMPLES = '''
      state: absent
 '''
 
-from ansible.module_utils.basic import *
+from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils import dcos
 
 
@@ -59,22 +84,93 @@ def dcos_group_present(params):
     module.exit_json(**result)
 
 
+def dcos_group_present_read_first(params):
+    client = dcos.DcosClient()
+    path = '/groups/{}'.format(params['gid'])
+    list_path = '/groups' if params['prefetch'] else None
+    result, group = dcos.read_object(client, path, list_path, 'gid', params['gid'])
+    if result['failed']:
+        module.fail_json(**result)
+    body = {
+        'description': params['description']
+    }
+    if group is None:
+        result = client.put(path, body)
+        if result['status_code'] == 409:
+            # created since it was read, compare against the group as it is now
+            result, group = dcos.read_object(client, path, cache=False)
+            if result['failed'] or group is None:
+                result.setdefault('msg', 'Failed to read group {}'.format(params['gid']))
+                module.fail_json(**result)
+    if group is not None and group.get('description') != params['description']:
+        result = client.patch(path, body)
+    if result['failed'] or result['status_code'] == 409:
+        result.setdefault('msg', 'Failed to write group {}'.format(params['gid']))
+        module.fail_json(**result)
+    module.exit_json(**result)
+
+
+def dcos_group_check(params, snapshot):
+    if snapshot:
+        group = snapshot['groups'].get(params['gid'])
+        result = {}
+    else:
+        client = dcos.DcosClient()
+        path = '/groups/{}'.format(params['gid'])
+        list_path = '/groups' if params['prefetch'] else None
+        result, group = dcos.read_object(client, path, list_path, 'gid', params['gid'])
+        if result['failed']:
+            module.fail_json(**result)
+        result = {'perf': client.perf}
+    before = {}
+    if group is not None:
+        before = {'gid': params['gid'], 'description': group.get('description')}
+    after = {}
+    if params['state'] == 'present':
+        after = {'gid': params['gid'], 'description': params['description']}
+    result.update(dcos.check_result(before, after))
+    module.exit_json(**result)
+
+
+def _unchanged_in_snapshot(params, snapshot):
+    group = snapshot['groups'].get(params['gid'])
+    if params['state'] == 'absent':
+        return group is None
+    return group is not None and group.get('description') == params['description']
+
+
 def main():
     global module
     module = AnsibleModule(argument_spec={
         'gid': { 'type': 'str', 'required': True },
         'description': { 'type': 'str', 'required': False },
+        'strategy': {
+            'type': 'str',
+            'required': False,
+            'default': 'put_first',
+            'choices': [ 'put_first', 'read_first' ]
+        },
+        'prefetch': { 'type': 'bool', 'required': False, 'default': False },
+        'snapshot': { 'type': 'dict', 'required': False },
+        'snapshot_path': { 'type': 'path', 'required': False },
         'state': {
             'type': 'str',
             'required': False,
             'default': 'present',
             'choices': [ 'present', 'absent' ]
         },
-    })
-    if module.params['state'] == 'present':
-        if module.params['description']:
-            dcos_group_present(module.params)
+    }, supports_check_mode=True)
+    snapshot = dcos.load_iam_snapshot(module.params)
+    if module.params['state'] == 'present' and not module.params['description']:
         module.fail_json(msg="User list and description required for state=present", rc=1)
+    if module.check_mode:
+        dcos_group_check(module.params, snapshot)
+    if snapshot and _unchanged_in_snapshot(module.params, snapshot):
+        module.exit_json(**dcos.snapshot_result())
+    if module.params['state'] == 'present':
+        if module.params['strategy'] == 'read_first':
+            dcos_group_present_read_first(module.params)
+        dcos_group_present(module.params)
     dcos_group_absent(module.params)
 
 
@@ -11,8 +11,24 @@ options:
         required: true
     uid:
         description:
-            - The uid of a user
+            - The uid of a user, or a list of uids. A list is added to or
+            removed from the group with concurrent requests.
         required: true
+    concurrency:
+        description:
+            - Maximum number of requests in flight when C(uid) is a list.
+        required: false
+        default: 10
+    snapshot:
+        description:
+            - IAM snapshot gathered by C(dcos_iam_facts). When it shows that
+            nothing needs to change the module returns without contacting
+            the cluster.
+        required: false
+    snapshot_path:
+        description:
+            - Path of a snapshot written by C(dcos_iam_facts) with C(dest).
+        required: false
     state:
         description:
             - If C(present), ensure the group exists. If C(absent),
@@ -28,6 +44,11 @@ EXAMPLES = '''
      gid: "mygroupname"
      uid: "myuid1"
 
+- name: Add several DCOS group members
+  dcos_group_member:
+     gid: "mygroupname"
+     uid: [ "myuid1", "myuid2", "myuid3" ]
+
 - name: Remove a DCOS group member
   dcos_group_member:
      gid: "mygroupname"
@@ -35,15 +56,35 @@ EXAMPLES = '''
      state: absent
 '''
 
-from ansible.module_utils.basic import *
+from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils import dcos
 
 
+def _member_path(gid, uid):
+    return '/groups/{gid}/users/{uid}'.format(gid=gid, uid=uid)
+
+
+def _exit_batch(client, results):
+    failed = any(r['failed'] for r in results)
+    result = {
+        'changed': any(r['changed'] for r in results),
+        'rc': 1 if failed else 0,
+        'failed': failed,
+        'results': results,
+        'perf': client.perf,
+    }
+    if failed:
+        module.fail_json(msg='Failed to update group members', **result)
+    module.exit_json(**result)
+
+
 def dcos_group_member_absent(params):
     client = dcos.DcosClient()
     gid = params['gid']
-    uid = params['uid']
-    path = '/groups/{gid}/users/{uid}'.format(gid=gid, uid=uid)
+    if len(params['uid']) > 1:
+        operations = [('delete', _member_path(gid, uid)) for uid in params['uid']]
+        _exit_batch(client, client.batch(operations, params['concurrency']))
+    path = _member_path(gid, params['uid'][0])
     result = client.delete(path)
     module.exit_json(**result)
 
@@ -51,8 +92,10 @@ def dcos_group_member_absent(params):
 def dcos_group_member_present(params):
     client = dcos.DcosClient()
     gid = params['gid']
-    uid = params['uid']
-    path = '/groups/{gid}/users/{uid}'.format(gid=gid, uid=uid)
+    if len(params['uid']) > 1:
+        operations = [('put', _member_path(gid, uid), {}) for uid in params['uid']]
+        _exit_batch(client, client.batch(operations, params['concurrency']))
+    path = _member_path(gid, params['uid'][0])
     result = client.put(path, {})
     if result['changed']:
         module.exit_json(**result)
@@ -64,18 +107,59 @@ def dcos_group_member_present(params):
     module.exit_json(**result)
 
 
+def dcos_group_member_check(params, snapshot):
+    group = snapshot['groups'].get(params['gid'], {'members': []}) if snapshot else {}
+    if 'members' in group:
+        members = set(group['members'])
+        result = {}
+    else:
+        client = dcos.DcosClient()
+        result, members = dcos.read_members(client, params['gid'])
+        if result['failed']:
+            module.fail_json(**result)
+        members = members or set()
+        result = {'perf': client.perf}
+    if params['state'] == 'present':
+        wanted = members | set(params['uid'])
+    else:
+        wanted = members - set(params['uid'])
+    before = {'gid': params['gid'], 'members': sorted(members)}
+    after = {'gid': params['gid'], 'members': sorted(wanted)}
+    result.update(dcos.check_result(before, after))
+    module.exit_json(**result)
+
+
+def _unchanged_in_snapshot(params, snapshot):
+    group = snapshot['groups'].get(params['gid'])
+    if group is None or 'members' not in group:
+        return params['state'] == 'absent' and group is None
+    if params['state'] == 'absent':
+        return not any(uid in group['members'] for uid in params['uid'])
+    return all(uid in group['members'] for uid in params['uid'])
+
+
 def main():
     global module
     module = AnsibleModule(argument_spec={
         'gid': { 'type': 'str', 'required': True },
-        'uid': { 'type': 'str', 'required': True },
+        'uid': { 'type': 'list', 'required': True },
+        'concurrency': { 'type': 'int', 'required': False, 'default': 10 },
+        'snapshot': { 'type': 'dict', 'required': False },
+        'snapshot_path': { 'type': 'path', 'required': False },
         'state': {
             'type': 'str',
             'required': False,
             'default': 'present',
             'choices': [ 'present', 'absent' ]
         },
-    })
+    }, supports_check_mode=True)
+    if not module.params['uid']:
+        module.fail_json(msg='uid requires at least one user')
+    snapshot = dcos.load_iam_snapshot(module.params)
+    if module.check_mode:
+        dcos_group_member_check(module.params, snapshot)
+    if snapshot and _unchanged_in_snapshot(module.params, snapshot):
+        module.exit_json(**dcos.snapshot_result())
     if module.params['state'] == 'present':
         dcos_group_member_present(module.params)
     else:
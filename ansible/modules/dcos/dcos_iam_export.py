@@ -0,0 +1,308 @@
+#!/usr/bin/python
+
+DOCUMENTATION = '''
+---
+module: dcos_iam_export
+short_description: Export or import DCOS IAM state as newline-delimited JSON
+description:
+    - Export writes one JSON record per line for every user, group, ACL,
+      group member and ACL permission, and optionally the paths of the
+      secrets. Members and permissions are fetched and written a chunk
+      at a time. Import reads such a file a chunk at a time and creates
+      the records with concurrent requests. Passwords and secret values
+      are never exported.
+options:
+    path:
+        description:
+            - File to write to or read from.
+        required: true
+    mode:
+        description:
+            - Whether to C(export) the cluster state to C(path) or
+            C(import) C(path) into the cluster. Defaults to C(export).
+        required: false
+        default: export
+        choices: [ export, import ]
+    include_secrets:
+        description:
+            - Also export the paths of the secrets in C(secret_store).
+            Secret records are skipped on import. Defaults to C(false).
+        required: false
+        default: false
+    secret_store:
+        description:
+            - Secret store whose paths are exported.
+        required: false
+        default: default
+    user_password:
+        description:
+            - Password given to the local users created on import. Service
+            accounts are created with their exported public key and remote
+            users with their provider, neither gets a password.
+        required: false
+    chunk_size:
+        description:
+            - Number of records fetched or applied at a time.
+        required: false
+        default: 100
+    concurrency:
+        description:
+            - Maximum number of requests in flight at once.
+        required: false
+        default: 10
+'''
+
+EXAMPLES = '''
+- name: Export the IAM state of the old cluster
+  dcos_iam_export:
+    path: "/backup/iam.ndjson"
+    include_secrets: true
+
+- name: Import it into the new cluster
+  dcos_iam_export:
+    path: "/backup/iam.ndjson"
+    mode: import
+    user_password: "{{ initial_password }}"
+'''
+
+import json
+import os
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils import dcos
+
+
+# record type, id field and collection, in the order they are exported
+OBJECTS = [
+    ('user', 'uid', '/users'),
+    ('group', 'gid', '/groups'),
+    ('acl', 'rid', '/acls'),
+]
+OBJECT_TYPES = dict((kind, (key, path)) for kind, key, path in OBJECTS)
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _list(client, path):
+    result = client.get(path)
+    if result['failed']:
+        module.fail_json(**result)
+    return result.get('json', {}).get('array', [])
+
+
+def _write(out, record, counts):
+    out.write(json.dumps(record, sort_keys=True))
+    out.write('\n')
+    counts[record['type']] = counts.get(record['type'], 0) + 1
+
+
+def _export_chunked(client, params, out, counts, ids, path, records):
+    for chunk in _chunks(ids, params['chunk_size']):
+        results = client.batch([('get', path.format(i)) for i in chunk],
+                               params['concurrency'])
+        for i, result in zip(chunk, results):
+            if result['failed']:
+                module.fail_json(**result)
+            for record in records(i, result.get('json', {})):
+                _write(out, record, counts)
+
+
+def _members(gid, data):
+    for member in data.get('array', []):
+        yield {'type': 'member', 'gid': gid, 'uid': member['user']['uid']}
+
+
+def _permissions(rid, data):
+    for kind, key in (('users', 'uid'), ('groups', 'gid')):
+        for entry in data.get(kind, []):
+            for action in entry.get('actions', []):
+                yield {'type': 'permission', 'rid': rid, 'kind': kind,
+                       'name': entry[key], 'action': action['name']}
+
+
+def _export(client, params, out, counts):
+    gids = []
+    rids = []
+    for kind, key, path in OBJECTS:
+        for item in _list(client, path):
+            item.pop('url', None)
+            item['type'] = kind
+            _write(out, item, counts)
+            if kind == 'group':
+                gids.append(item['gid'])
+            elif kind == 'acl':
+                rids.append(item['rid'])
+    _export_chunked(client, params, out, counts, gids, '/groups/{}/users', _members)
+    _export_chunked(client, params, out, counts, rids, '/acls/{}/permissions', _permissions)
+    if params['include_secrets']:
+        secrets = client.for_service('/secrets/v1')
+        result = secrets.get('/secret/{}/?list=true'.format(params['secret_store']))
+        # an empty store is not found
+        if result['failed'] and result['status_code'] != 404:
+            module.fail_json(**result)
+        for path in result.get('json', {}).get('array', []):
+            _write(out, {'type': 'secret', 'store': params['secret_store'],
+                         'path': path}, counts)
+
+
+def dcos_iam_export(params):
+    client = dcos.DcosClient(pool_size=params['concurrency'])
+    counts = {}
+    # check mode reads everything but writes nothing, otherwise the
+    # previous export is only replaced once the new one is complete
+    tmp = os.devnull if module.check_mode else '{}.{}'.format(params['path'], os.getpid())
+    try:
+        with open(tmp, 'w') as out:
+            _export(client, params, out, counts)
+        if not module.check_mode:
+            os.rename(tmp, params['path'])
+    finally:
+        if not module.check_mode and os.path.exists(tmp):
+            os.remove(tmp)
+    module.exit_json(changed=True, rc=0, failed=False, path=params['path'], counts=counts,
+                     perf=client.perf)
+
+
+def _user_body(record, params):
+    # service accounts log in with their key and remote users through their
+    # provider, only local users get the password
+    body = {'description': record.get('description') or record['uid']}
+    if record.get('is_service'):
+        if not record.get('public_key'):
+            return None
+        body['public_key'] = record['public_key']
+    elif record.get('provider_type', 'internal') != 'internal':
+        body['provider_type'] = record['provider_type']
+        if record.get('provider_id'):
+            body['provider_id'] = record['provider_id']
+    elif params['user_password']:
+        body['password'] = params['user_password']
+    return body
+
+
+def _operation(record, params):
+    if record['type'] == 'user':
+        body = _user_body(record, params)
+        if body is None:
+            return None, None
+        return '/users/{}'.format(record['uid']), body
+    if record['type'] in OBJECT_TYPES:
+        key, path = OBJECT_TYPES[record['type']]
+        body = {'description': record.get('description') or record[key]}
+        return '{}/{}'.format(path, record[key]), body
+    if record['type'] == 'member':
+        return '/groups/{gid}/users/{uid}'.format(**record), {}
+    if record['type'] == 'permission':
+        return '/acls/{rid}/{kind}/{name}/{action}'.format(**record), {}
+    return None, None
+
+
+def _apply_chunk(client, params, chunk, counts, failures):
+    # objects first, so members and permissions in the same chunk find them
+    objects = [r for r in chunk if r['type'] in OBJECT_TYPES]
+    grants = [r for r in chunk if r['type'] not in OBJECT_TYPES]
+    for records in (objects, grants):
+        operations = []
+        for record in records:
+            path, body = _operation(record, params)
+            if path:
+                operations.append(('put', path, body))
+            elif record['type'] == 'user':
+                failures.append({'failed': True, 'uid': record['uid'],
+                                 'msg': 'Service account without a public key'})
+        for result in client.batch(operations, params['concurrency']):
+            result.pop('request_body', None)
+            if result['failed']:
+                failures.append(result)
+            elif result['changed']:
+                counts['changed'] += 1
+            counts['applied'] += 1
+
+
+def _exists(record, snapshot):
+    if record['type'] in OBJECT_TYPES:
+        key = OBJECT_TYPES[record['type']][0]
+        return record[key] in snapshot[record['type'] + 's']
+    if record['type'] == 'member':
+        group = snapshot['groups'].get(record['gid'], {})
+        return record['uid'] in group.get('members', ())
+    if record['type'] == 'permission':
+        acl = snapshot['acls'].get(record['rid'], {})
+        return record['action'] in acl.get(record['kind'], {}).get(record['name'], ())
+    return True
+
+
+def dcos_iam_import_check(params):
+    client = dcos.DcosClient(pool_size=params['concurrency'])
+    snapshot, failures = dcos.fetch_iam_snapshot(client, concurrency=params['concurrency'])
+    if failures:
+        module.fail_json(**failures[0])
+    planned = []
+    with open(params['path']) as stream:
+        for line in stream:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            path = _operation(record, params)[0]
+            if path and not _exists(record, snapshot):
+                planned.append(('put', path))
+    module.exit_json(changed=bool(planned), rc=0, failed=False,
+                     counts={'applied': len(planned), 'changed': len(planned)},
+                     diff=dcos.operations_diff(planned), perf=client.perf)
+
+
+def dcos_iam_import(params):
+    client = dcos.DcosClient(pool_size=params['concurrency'])
+    counts = {'applied': 0, 'changed': 0}
+    failures = []
+    chunk = []
+    with open(params['path']) as stream:
+        for line in stream:
+            if not line.strip():
+                continue
+            chunk.append(json.loads(line))
+            if len(chunk) >= params['chunk_size']:
+                _apply_chunk(client, params, chunk, counts, failures)
+                chunk = []
+    _apply_chunk(client, params, chunk, counts, failures)
+
+    result = {
+        'changed': counts['changed'] > 0,
+        'rc': 1 if failures else 0,
+        'failed': bool(failures),
+        'counts': counts,
+        'perf': client.perf,
+    }
+    if failures:
+        module.fail_json(msg='{} requests failed'.format(len(failures)),
+                         failures=failures[:100], **result)
+    module.exit_json(**result)
+
+
+def main():
+    global module
+    module = AnsibleModule(argument_spec={
+        'path': { 'type': 'path', 'required': True },
+        'mode': {
+            'type': 'str',
+            'required': False,
+            'default': 'export',
+            'choices': [ 'export', 'import' ]
+        },
+        'include_secrets': { 'type': 'bool', 'required': False, 'default': False },
+        'secret_store': { 'type': 'str', 'required': False, 'default': 'default' },
+        'user_password': { 'type': 'str', 'required': False, 'no_log': True },
+        'chunk_size': { 'type': 'int', 'required': False, 'default': 100 },
+        'concurrency': { 'type': 'int', 'required': False, 'default': 10 },
+    }, supports_check_mode=True)
+    if module.params['mode'] == 'import':
+        if module.check_mode:
+            dcos_iam_import_check(module.params)
+        dcos_iam_import(module.params)
+    dcos_iam_export(module.params)
+
+
+if __name__ == '__main__':
+    main()
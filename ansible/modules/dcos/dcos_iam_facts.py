@@ -0,0 +1,76 @@
+#!/usr/bin/python
+
+DOCUMENTATION = '''
+---
+module: dcos_iam_facts
+short_description: Gather a snapshot of DCOS users, groups and ACLs
+description:
+    - Read users, groups, group members and ACL permissions with the list
+      endpoints and return them as C(dcos_iam), with users, groups and
+      ACLs keyed by uid, gid and rid. The snapshot can be passed to
+      C(dcos_user), C(dcos_group), C(dcos_group_member), C(dcos_acl_user)
+      and C(dcos_acl_group) so they decide locally whether anything
+      needs to change.
+options:
+    dest:
+        description:
+            - Also write the snapshot as JSON to this file, to be used with
+            the C(snapshot_path) option of the other modules. The file is
+            written in check mode too.
+        required: false
+    concurrency:
+        description:
+            - Maximum number of requests in flight at once.
+        required: false
+        default: 10
+'''
+
+EXAMPLES = '''
+- name: Snapshot the IAM state
+  dcos_iam_facts:
+
+- name: Only create users that are missing
+  dcos_user:
+     uid: "{{ item.uid }}"
+     password: "{{ item.password }}"
+     description: "{{ item.description }}"
+     snapshot: "{{ dcos_iam }}"
+  with_items: "{{ users }}"
+
+- name: Snapshot the IAM state to a file
+  dcos_iam_facts:
+    dest: "/tmp/dcos_iam.json"
+'''
+
+import json
+import os
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils import dcos
+
+
+def dcos_iam_facts(params):
+    client = dcos.DcosClient(pool_size=params['concurrency'])
+    snapshot, failures = dcos.fetch_iam_snapshot(client, concurrency=params['concurrency'])
+    if failures:
+        module.fail_json(**failures[0])
+    snapshot = dcos.snapshot_to_json(snapshot)
+    if params['dest']:
+        tmp = '{}.{}'.format(params['dest'], os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(snapshot, f)
+        os.rename(tmp, params['dest'])
+    module.exit_json(changed=False, rc=0, failed=False, perf=client.perf,
+                     ansible_facts={'dcos_iam': snapshot})
+
+
+def main():
+    global module
+    module = AnsibleModule(argument_spec={
+        'dest': { 'type': 'path', 'required': False },
+        'concurrency': { 'type': 'int', 'required': False, 'default': 10 },
+    }, supports_check_mode=True)
+    dcos_iam_facts(module.params)
+
+
+if __name__ == '__main__':
+    main()
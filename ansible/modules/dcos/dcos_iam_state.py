@@ -0,0 +1,200 @@
+#!/usr/bin/python
+
+DOCUMENTATION = '''
+---
+module: dcos_iam_state
+short_description: Reconcile DCOS users, groups and ACLs in bulk
+description:
+    - Fetch the current IAM state with the list endpoints, compute the
+      difference with the declared state in memory and apply only the
+      required changes in parallel.
+options:
+    users:
+        description:
+            - List of users. Each item requires C(uid) and may set
+            C(description) and C(password). The password is only used
+            when the user is created and is not logged.
+        required: false
+        default: []
+    groups:
+        description:
+            - List of groups. Each item requires C(gid) and may set
+            C(description) and C(members), a list of uids.
+        required: false
+        default: []
+    acls:
+        description:
+            - List of ACLs. Each item requires C(rid) and may set
+            C(description), C(users) and C(groups). C(users) and
+            C(groups) map a uid or gid to a list of permissions,
+            e.g. read, full, ...
+        required: false
+        default: []
+    purge:
+        description:
+            - Remove group members and ACL permissions that are not
+            declared for the listed groups and ACLs. Users, groups and
+            ACLs that are not listed are never removed. Defaults to
+            C(false).
+        required: false
+        default: false
+    concurrency:
+        description:
+            - Maximum number of requests in flight at once.
+        required: false
+        default: 10
+'''
+
+EXAMPLES = '''
+- name: Converge the IAM state of the cluster
+  dcos_iam_state:
+    users:
+      - uid: "bobslydell"
+        description: "Bob Slydell"
+        password: "fooBar123ASDF"
+      - uid: "bobporter"
+        description: "Bob Porter"
+        password: "fooBar123ASDF"
+    groups:
+      - gid: "bobs"
+        description: "the bobs"
+        members: [ "bobslydell", "bobporter" ]
+    acls:
+      - rid: "dcos:adminrouter:service:marathon"
+        description: "Marathon UI"
+        groups:
+          bobs: [ "full" ]
+    purge: true
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils import dcos
+
+
+def _fetch_state(client, params):
+    gids = [g['gid'] for g in params['groups']]
+    rids = [a['rid'] for a in params['acls']]
+    state, failures = dcos.fetch_iam_snapshot(client, gids, rids, params['concurrency'])
+    if failures:
+        module.fail_json(**failures[0])
+    return state
+
+
+def _diff_objects(declared, current, key, path):
+    operations = []
+    for item in declared:
+        path_id = path.format(item[key])
+        description = item.get('description')
+        if item[key] not in current:
+            body = {'description': description or item[key]}
+            if item.get('password'):
+                body['password'] = item['password']
+            operations.append(('put', path_id, body))
+        elif description is not None and \
+                current[item[key]].get('description') != description:
+            operations.append(('patch', path_id, {'description': description}))
+    return operations
+
+
+def _diff_members(params, state):
+    operations = []
+    for group in params['groups']:
+        if group.get('members') is None:
+            continue
+        path = '/groups/' + group['gid'] + '/users/{}'
+        wanted = set(group['members'])
+        current = state['groups'].get(group['gid'], {}).get('members', set())
+        for uid in sorted(wanted - current):
+            operations.append(('put', path.format(uid), {}))
+        if params['purge']:
+            for uid in sorted(current - wanted):
+                operations.append(('delete', path.format(uid)))
+    return operations
+
+
+def _diff_permissions(params, state):
+    operations = []
+    for acl in params['acls']:
+        wanted = set()
+        for kind in ('users', 'groups'):
+            for name, actions in (acl.get(kind) or {}).items():
+                if isinstance(actions, basestring):
+                    actions = [actions]
+                for action in actions:
+                    wanted.add((kind, name, action))
+        current = set()
+        granted = state['acls'].get(acl['rid'], {})
+        for kind in ('users', 'groups'):
+            for name, actions in granted.get(kind, {}).items():
+                current.update((kind, name, action) for action in actions)
+        path = '/acls/' + acl['rid'] + '/{}/{}/{}'
+        for grant in sorted(wanted - current):
+            operations.append(('put', path.format(*grant), {}))
+        if params['purge']:
+            for grant in sorted(current - wanted):
+                operations.append(('delete', path.format(*grant)))
+    return operations
+
+
+def _apply(client, params, operations):
+    results = client.batch(operations, params['concurrency'])
+    for result in results:
+        result.pop('request_body', None)
+    return results
+
+
+def dcos_iam_state(params):
+    client = dcos.DcosClient(pool_size=params['concurrency'])
+    state = _fetch_state(client, params)
+    objects = []
+    objects.extend(_diff_objects(params['users'], state['users'], 'uid', '/users/{}'))
+    objects.extend(_diff_objects(params['groups'], state['groups'], 'gid', '/groups/{}'))
+    objects.extend(_diff_objects(params['acls'], state['acls'], 'rid', '/acls/{}'))
+    grants = _diff_members(params, state) + _diff_permissions(params, state)
+    if module.check_mode:
+        module.exit_json(changed=bool(objects or grants), rc=0, failed=False,
+                         changes=[{'action': op[0], 'path': op[1]} for op in objects + grants],
+                         diff=dcos.operations_diff(objects + grants), perf=client.perf)
+    results = _apply(client, params, objects)
+    results.extend(_apply(client, params, grants))
+
+    failures = [r for r in results if r['failed']]
+    result = {
+        'changed': any(r['changed'] for r in results),
+        'rc': 1 if failures else 0,
+        'failed': bool(failures),
+        'changes': [
+            {'action': r['request_action'], 'request_url': r['request_url'],
+             'status_code': r.get('status_code')}
+            for r in results if r['changed']
+        ],
+        'perf': client.perf,
+    }
+    if module._diff:
+        result['diff'] = dcos.operations_diff(objects + grants)
+    if failures:
+        result['msg'] = '{} of {} requests failed'.format(len(failures), len(results))
+        result['failures'] = failures
+        module.fail_json(**result)
+    module.exit_json(**result)
+
+
+def main():
+    global module
+    module = AnsibleModule(argument_spec={
+        # only the passwords are kept out of the logs and the output
+        'users': { 'type': 'list', 'elements': 'dict', 'required': False, 'default': [], 'options': {
+            'uid': { 'type': 'str', 'required': True },
+            'description': { 'type': 'str', 'required': False },
+            'password': { 'type': 'str', 'required': False, 'no_log': True },
+        }},
+        'groups': { 'type': 'list', 'required': False, 'default': [] },
+        'acls': { 'type': 'list', 'required': False, 'default': [] },
+        'purge': { 'type': 'bool', 'required': False, 'default': False },
+        'concurrency': { 'type': 'int', 'required': False, 'default': 10 },
+    }, supports_check_mode=True)
+    dcos_iam_state(module.params)
+
+
+if __name__ == '__main__':
+    main()
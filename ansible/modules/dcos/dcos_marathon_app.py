@@ -0,0 +1,172 @@
+#!/usr/bin/python
+
+DOCUMENTATION = '''
+---
+module: dcos_marathon_app
+short_description: Manage a Marathon app on DCOS
+description:
+    - Read the app once and only send its definition when one of the
+      given fields differs from the deployed app. Fields left out of
+      C(app) are not compared, Marathon keeps or defaults them. C(env),
+      C(labels) and C(secrets) are compared as a whole, and a port of 0
+      matches the port Marathon assigned.
+options:
+    app:
+        description:
+            - Marathon app definition, C(id) is required.
+        required: true
+    force:
+        description:
+            - Override a deployment in progress for the app. Defaults to
+            C(false).
+        required: false
+        default: false
+    direct:
+        description:
+            - Send the deployment straight to the Marathon leader instead of
+            through adminrouter, over https when the leader listens on port
+            8443. Other leaders are only used with C(insecure_leader).
+            Defaults to C(false).
+        required: false
+        default: false
+    insecure_leader:
+        description:
+            - With C(direct), send the deployment and the token over plain
+            http to a leader not listening on port 8443 instead of going
+            through adminrouter. Defaults to C(false).
+        required: false
+        default: false
+    wait:
+        description:
+            - Wait until the app is deployed and healthy. Defaults to
+            C(false).
+        required: false
+        default: false
+    timeout:
+        description:
+            - Seconds to wait for the app when C(wait) is true.
+        required: false
+        default: 600
+    poll_interval:
+        description:
+            - Initial seconds between Marathon polls.
+        required: false
+        default: 2
+    state:
+        description:
+            - If C(present), ensure the app is deployed with the given
+            definition. If C(absent), ensure the app does not exist.
+            Defaults to C(present).
+        required: false
+        default: present
+        choices: [ present, absent ]
+'''
+
+EXAMPLES = '''
+- name: Deploy nginx
+  dcos_marathon_app:
+    app:
+      id: "/tenant-a/nginx"
+      instances: 2
+      cpus: 0.5
+      mem: 128
+      container:
+        type: DOCKER
+        docker:
+          image: "nginx:1.11"
+    wait: true
+
+- name: Remove nginx
+  dcos_marathon_app:
+    app:
+      id: "/tenant-a/nginx"
+    state: absent
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils import dcos
+
+
+def _endpoint(params, app_id):
+    return '/apps{}{}'.format(app_id, '?force=true' if params['force'] else '')
+
+
+def _read_app(marathon, app_id):
+    result = marathon.get('/apps{}'.format(app_id), cache=False)
+    if result['status_code'] == 404:
+        return None
+    if result['failed']:
+        module.fail_json(msg='Failed to read app', debug=result)
+    return result['json'].get('app')
+
+
+def dcos_marathon_app_absent(marathon, params, app_id):
+    current = dcos.marathon_definition(_read_app(marathon, app_id))
+    if module.check_mode:
+        module.exit_json(perf=marathon.perf, **dcos.check_result(current or {}, {}))
+    if current is None:
+        module.exit_json(changed=False, rc=0, failed=False, perf=marathon.perf)
+    result = marathon.delete(_endpoint(params, app_id))
+    if result['failed'] and result['status_code'] != 404:
+        module.fail_json(msg='Failed to delete app', debug=result)
+    result['changed'] = result['status_code'] != 404
+    module.exit_json(**result)
+
+
+def dcos_marathon_app_present(marathon, params, app):
+    current = dcos.marathon_definition(_read_app(marathon, app['id']))
+    changed = current is None or dcos.definition_differs(app, current)
+    if module.check_mode:
+        after = dict(current or {}, **app)
+        module.exit_json(perf=marathon.perf, **dcos.check_result(current or {}, after, changed))
+    if not changed:
+        module.exit_json(changed=False, rc=0, failed=False, app=current, perf=marathon.perf)
+
+    result = marathon.put(_endpoint(params, app['id']), app)
+    if result['failed']:
+        module.fail_json(msg='Failed to deploy app', debug=result)
+    result['changed'] = True
+    if params['wait']:
+        ready, apps = dcos.wait_for_apps(marathon, [app['id']],
+                                         params['timeout'], params['poll_interval'])
+        if not ready:
+            module.fail_json(msg='Timed out waiting for {} to become healthy'.format(app['id']),
+                    changed=True, debug=apps.get(app['id']))
+        result['app'] = apps[app['id']]
+    if module._diff:
+        result['diff'] = {'before': current or {}, 'after': dict(current or {}, **app)}
+    module.exit_json(**result)
+
+
+def main():
+    global module
+    module = AnsibleModule(argument_spec={
+        'app': { 'type': 'dict', 'required': True },
+        'force': { 'type': 'bool', 'required': False, 'default': False },
+        'direct': { 'type': 'bool', 'required': False, 'default': False },
+        'insecure_leader': { 'type': 'bool', 'required': False, 'default': False },
+        'wait': { 'type': 'bool', 'required': False, 'default': False },
+        'timeout': { 'type': 'int', 'required': False, 'default': 600 },
+        'poll_interval': { 'type': 'float', 'required': False, 'default': 2 },
+        'state': {
+            'type': 'str',
+            'required': False,
+            'default': 'present',
+            'choices': [ 'present', 'absent' ]
+        },
+    }, supports_check_mode=True)
+    app = module.params['app']
+    if not app.get('id'):
+        module.fail_json(msg='app requires an id')
+    app = dict(app, id=dcos.marathon_id('/', app['id']))
+
+    client = dcos.DcosClient(service_path=dcos.MARATHON_SERVICE_PATH)
+    marathon = client.marathon(direct=module.params['direct'],
+                               insecure=module.params['insecure_leader'])
+    if module.params['state'] == 'present':
+        dcos_marathon_app_present(marathon, module.params, app)
+    dcos_marathon_app_absent(marathon, module.params, app['id'])
+
+
+if __name__ == '__main__':
+    main()
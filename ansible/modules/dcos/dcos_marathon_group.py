@@ -0,0 +1,232 @@
+#!/usr/bin/python
+
+DOCUMENTATION = '''
+---
+module: dcos_marathon_group
+short_description: Manage a tree of Marathon apps on DCOS in one deployment
+description:
+    - Read the group tree once, compare the given app definitions with the
+      deployed apps locally and submit all the changed apps together in a
+      single Marathon deployment. Fields left out of an app definition are
+      not compared, C(env), C(labels) and C(secrets) are compared as a
+      whole and a port of 0 matches the port Marathon assigned.
+options:
+    group:
+        description:
+            - Marathon group definition with C(id) and optionally C(apps) and
+            nested C(groups). App and group ids may be relative to their
+            parent group.
+        required: true
+    prune:
+        description:
+            - Remove the apps and groups below C(group) that are not in the
+            definition. The whole tree is then sent with C(PUT /v2/groups),
+            otherwise only the changed apps are sent with C(PUT /v2/apps).
+            Defaults to C(false).
+        required: false
+        default: false
+    force:
+        description:
+            - Override deployments in progress for the apps. Defaults to
+            C(false).
+        required: false
+        default: false
+    direct:
+        description:
+            - Send the deployment straight to the Marathon leader instead of
+            through adminrouter, over https when the leader listens on port
+            8443. Other leaders are only used with C(insecure_leader).
+            Defaults to C(false).
+        required: false
+        default: false
+    insecure_leader:
+        description:
+            - With C(direct), send the deployment and the token over plain
+            http to a leader not listening on port 8443 instead of going
+            through adminrouter. Defaults to C(false).
+        required: false
+        default: false
+    wait:
+        description:
+            - Wait until every changed app is deployed and healthy. Defaults
+            to C(false).
+        required: false
+        default: false
+    timeout:
+        description:
+            - Seconds to wait for the apps when C(wait) is true.
+        required: false
+        default: 600
+    poll_interval:
+        description:
+            - Initial seconds between Marathon polls.
+        required: false
+        default: 2
+    state:
+        description:
+            - If C(present), ensure the apps are deployed with the given
+            definitions. If C(absent), remove the group and all its apps.
+            Defaults to C(present).
+        required: false
+        default: present
+        choices: [ present, absent ]
+'''
+
+EXAMPLES = '''
+- name: Deploy the apps of tenant a in one deployment
+  dcos_marathon_group:
+    group:
+      id: "/tenant-a"
+      apps:
+        - { id: "web", instances: 4, cmd: "python -m SimpleHTTPServer $PORT0", cpus: 0.1, mem: 64 }
+      groups:
+        - id: "workers"
+          apps: "{{ workers }}"
+    wait: true
+
+- name: Remove tenant a
+  dcos_marathon_group:
+    group:
+      id: "/tenant-a"
+    state: absent
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils import dcos
+
+
+def _force(params):
+    return '?force=true' if params['force'] else ''
+
+
+def _resolve(group, parent_id='/'):
+    # the group with absolute ids throughout
+    group_id = dcos.marathon_id(parent_id, group['id'])
+    resolved = dict(group, id=group_id)
+    resolved['apps'] = [dict(app, id=dcos.marathon_id(group_id, app['id']))
+                        for app in group.get('apps', [])]
+    resolved['groups'] = [_resolve(child, group_id) for child in group.get('groups', [])]
+    return resolved
+
+
+def _apps(group):
+    # the apps of a group tree by id
+    apps = dict((app['id'], app) for app in group.get('apps', []))
+    for child in group.get('groups', []):
+        apps.update(_apps(child))
+    return apps
+
+
+def _validate(group):
+    if not group.get('id'):
+        module.fail_json(msg='Every group requires an id', group=group)
+    for app in group.get('apps', []):
+        if not app.get('id'):
+            module.fail_json(msg='Every app requires an id', app=app)
+    for child in group.get('groups', []):
+        _validate(child)
+
+
+def _read_group(marathon, group_id):
+    result = marathon.get('/groups{}?embed=group.groups&embed=group.apps'.format(group_id),
+                          cache=False)
+    if result['status_code'] == 404:
+        return None
+    if result['failed']:
+        module.fail_json(msg='Failed to read group', debug=result)
+    return result['json']
+
+
+def dcos_marathon_group_absent(marathon, params, group_id):
+    current = _read_group(marathon, group_id)
+    before = dict((i, dcos.marathon_definition(a))
+                  for i, a in _apps(current or {}).items())
+    if module.check_mode:
+        module.exit_json(perf=marathon.perf,
+                         **dcos.check_result(before, {}, current is not None))
+    if current is None:
+        module.exit_json(changed=False, rc=0, failed=False, perf=marathon.perf)
+    result = marathon.delete('/groups{}{}'.format(group_id, _force(params)))
+    if result['failed'] and result['status_code'] != 404:
+        module.fail_json(msg='Failed to delete group', debug=result)
+    result['changed'] = result['status_code'] != 404
+    module.exit_json(**result)
+
+
+def dcos_marathon_group_present(marathon, params, group):
+    current = _apps(_read_group(marathon, group['id']) or {})
+    desired = _apps(group)
+    changed = [i for i in sorted(desired)
+               if i not in current or dcos.definition_differs(desired[i], current[i])]
+    removed = sorted(set(current) - set(desired)) if params['prune'] else []
+
+    before = dict((i, dcos.marathon_definition(current[i]))
+                  for i in changed + removed if i in current)
+    after = dict((i, dict(before.get(i, {}), **desired[i])) for i in changed)
+    diff = {'before': before, 'after': after}
+    if module.check_mode:
+        module.exit_json(changed=bool(changed or removed), rc=0, failed=False,
+                         changed_apps=changed, removed_apps=removed,
+                         diff=diff, perf=marathon.perf)
+    if not changed and not removed:
+        module.exit_json(changed=False, rc=0, failed=False,
+                         changed_apps=[], removed_apps=[], perf=marathon.perf)
+
+    # marathon stops the apps missing from a group update, so the whole
+    # tree is only sent when pruning
+    if removed:
+        result = marathon.put('/groups{}{}'.format(group['id'], _force(params)), group)
+    else:
+        result = marathon.put('/apps{}'.format(_force(params)),
+                              [desired[i] for i in changed])
+    if result['failed']:
+        module.fail_json(msg='Failed to deploy group', debug=result)
+    result['changed'] = True
+    result['changed_apps'] = changed
+    result['removed_apps'] = removed
+
+    if params['wait'] and changed:
+        ready, apps = dcos.wait_for_apps(marathon, changed,
+                                         params['timeout'], params['poll_interval'])
+        if not ready:
+            pending = [i for i in changed if not (i in apps and dcos.app_is_ready(apps[i]))]
+            module.fail_json(msg='Timed out waiting for {} apps to become healthy'.format(len(pending)),
+                    changed=True, pending_apps=pending, perf=marathon.perf)
+    if module._diff:
+        result['diff'] = diff
+    module.exit_json(**result)
+
+
+def main():
+    global module
+    module = AnsibleModule(argument_spec={
+        'group': { 'type': 'dict', 'required': True },
+        'prune': { 'type': 'bool', 'required': False, 'default': False },
+        'force': { 'type': 'bool', 'required': False, 'default': False },
+        'direct': { 'type': 'bool', 'required': False, 'default': False },
+        'insecure_leader': { 'type': 'bool', 'required': False, 'default': False },
+        'wait': { 'type': 'bool', 'required': False, 'default': False },
+        'timeout': { 'type': 'int', 'required': False, 'default': 600 },
+        'poll_interval': { 'type': 'float', 'required': False, 'default': 2 },
+        'state': {
+            'type': 'str',
+            'required': False,
+            'default': 'present',
+            'choices': [ 'present', 'absent' ]
+        },
+    }, supports_check_mode=True)
+    _validate(module.params['group'])
+    group = _resolve(module.params['group'])
+    if group['id'] == '':
+        module.fail_json(msg='The root group can not be managed')
+
+    client = dcos.DcosClient(service_path=dcos.MARATHON_SERVICE_PATH)
+    marathon = client.marathon(direct=module.params['direct'],
+                               insecure=module.params['insecure_leader'])
+    if module.params['state'] == 'present':
+        dcos_marathon_group_present(marathon, module.params, group)
+    dcos_marathon_group_absent(marathon, module.params, group['id'])
+
+
+if __name__ == '__main__':
+    main()
@@ -5,31 +5,51 @@ DOCUMENTATION = '''
 module: dcos_marathon_leader
 short_description: Manage secrets on DCOS
 options:
+    ttl:
+        description:
+            - Reuse a leader resolved by an earlier task if it is at most
+            this many seconds old. The default of 0 always asks Marathon.
+        required: false
+        default: 0
 '''
 
 EXAMPLES = '''
 - name: Get the marathon leader
   dcos_marathon_leader:
     register: marathon_leader
+
+- name: Get the marathon leader, resolving it at most once a minute
+  dcos_marathon_leader:
+    ttl: 60
+    register: marathon_leader
 '''
 
-from ansible.module_utils.basic import *
+from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils import dcos
 
 
 
 def dcos_marathon_leader(params):
-    client = dcos.DcosClient(service_path='/service/marathon/v2')
-    result = client.get('/leader')
+    if params['ttl']:
+        # a cached leader is returned without creating a client
+        dcos_url = dcos.read_configuration().get('dcos_url', '')
+        leader = dcos.cached_marathon_leader(dcos_url, params['ttl'])
+        if leader:
+            module.exit_json(changed=False, rc=0, failed=False, leader=leader, cached=True)
+    client = dcos.DcosClient(service_path=dcos.MARATHON_SERVICE_PATH)
+    result = client.get('/leader', cache=False)
     if 'json' in result:
         if 'leader' in result['json']:
             result['leader'] = result['json']['leader']
+            dcos.cache_marathon_leader(client.dcos_url, result['leader'])
     module.exit_json(**result)
 
 
 def main():
     global module
-    module = AnsibleModule(argument_spec={})
+    module = AnsibleModule(argument_spec={
+        'ttl': { 'type': 'int', 'required': False, 'default': 0 },
+    }, supports_check_mode=True)
     dcos_marathon_leader(module.params)
 
 
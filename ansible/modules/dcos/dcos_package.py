@@ -13,8 +13,8 @@ options:
         required: true
     options:
         description:
-            - Options passed to the C(dcos package install) command via JSON.
-            See Marathon documentation for available options.
+            - Options passed to the Cosmos package install request.
+            See the package documentation for available options.
         required: false
     state:
         description:
@@ -23,6 +23,35 @@ options:
         required: false
         default: present
         choices: [ present, absent ]
+    index_file:
+        description:
+            - Path of a JSON index mapping app ids to installed packages.
+            When set, the index is built from one full package listing and
+            reused by later tasks until it is older than C(index_ttl).
+            Without it only the package at C(app_id) is queried.
+        required: false
+    index_ttl:
+        description:
+            - Maximum age in seconds of C(index_file) before it is rebuilt.
+        required: false
+        default: 300
+    wait:
+        description:
+            - Wait until the installed app is deployed and its tasks are
+            running and healthy. Defaults to C(false).
+        required: false
+        default: false
+    timeout:
+        description:
+            - Seconds to wait for the app when C(wait) is true.
+        required: false
+        default: 600
+    poll_interval:
+        description:
+            - Initial seconds between Marathon polls. The interval grows
+            exponentially, with jitter, up to 30 seconds.
+        required: false
+        default: 2
     delete_empty_group:
         description:
             - Delete the marathon group from which the package was uninstalled
@@ -43,6 +72,18 @@ EXAMPLES = '''
         cpus: 2.0
         mem: 1536
         instances: 1
+    wait: true
+    timeout: 900
+
+- name: Install Kafka for many tenants, sharing one package listing
+  dcos_package:
+    package: kafka
+    app_id: "/{{ item }}/kafka"
+    options:
+      service:
+        name: "{{ item }}/kafka"
+    index_file: "/tmp/dcos_packages.json"
+  with_items: "{{ tenants }}"
 
 - name: Uninstall user Marathon
   dcos_package:
@@ -53,43 +94,84 @@ EXAMPLES = '''
 
 import json
 import os
-import subprocess
-import tempfile
-from ansible.module_utils.basic import *
-
-
-def dcos_cli(args):
-    command = [ 'dcos' ]
-    command.extend(args)
-    p = subprocess.Popen(command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                close_fds=True)
-    stdout = p.communicate()[0]
-    rc = p.returncode
-    return rc, stdout
-
-
-def _check_installed_packages(params):
-    rc, output = dcos_cli(['package', 'list', '--json'])
-    package_list = json.loads(output)
+import time
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils import dcos
+
+
+def _read_index(params):
+    path = params['index_file']
+    try:
+        if time.time() - os.path.getmtime(path) > params['index_ttl']:
+            return None
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, IOError, ValueError):
+        return None
+
+
+def _write_index(params, index):
+    path = params['index_file']
+    tmp = '{}.{}'.format(path, os.getpid())
+    with open(tmp, 'w') as f:
+        json.dump(index, f)
+    os.rename(tmp, path)
+
+
+def _update_index(params, name):
+    if not params['index_file']:
+        return
+    index = _read_index(params)
+    if index is None:
+        return
+    if name:
+        index[params['app_id']] = name
+    else:
+        index.pop(params['app_id'], None)
+    _write_index(params, index)
+
+
+def _list_packages(client, body):
+    result = dcos.cosmos(client, 'list', body)
+    if result['failed']:
+        module.fail_json(msg='Failed to list packages', debug=result)
+    return result['json'].get('packages', [])
+
+
+def _installed_package(client, params):
+    if params['index_file']:
+        index = _read_index(params)
+        if index is None:
+            index = {}
+            for package in _list_packages(client, {}):
+                index[package.get('appId')] = dcos.cosmos_package_name(package)
+            _write_index(params, index)
+        name = index.get(params['app_id'])
+        if not name:
+            return None, []
+        return name, [{'appId': params['app_id'], 'packageName': name}]
+
+    package_list = _list_packages(client, {'appId': params['app_id']})
     for package in package_list:
-        if 'apps' not in package:
-            continue
-        if params['app_id'] not in package['apps']:
-            continue
-        if params['package'] == package['name']:
-            # package already installed
-            return True, package_list
-        else:
-            # wrong package installed at app_id!
-            module.fail_json(msg='Wrong package ({package}) installed at app_id ({appid})!'.format(
-                    package=package['name'], appid=params['app_id']
-                ))
-    return False, package_list
-
-
-def _clean_up_group(params):
+        if params['app_id'] == package.get('appId'):
+            return dcos.cosmos_package_name(package), package_list
+    return None, package_list
+
+
+def _check_installed_packages(client, params):
+    name, package_list = _installed_package(client, params)
+    if name is None:
+        return False, package_list
+    if params['package'] == name:
+        # package already installed
+        return True, package_list
+    # wrong package installed at app_id!
+    module.fail_json(msg='Wrong package ({package}) installed at app_id ({appid})!'.format(
+            package=name, appid=params['app_id']
+        ))
+
+
+def _clean_up_group(client, params):
     if not params['delete_empty_group']:
         return False
 
@@ -99,64 +181,77 @@ def _clean_up_group(params):
         # we're at the root. no deleting the root!
         return False
     group_id = appid[:appid.rfind('/')]
-    group_list_command = [ 'marathon', 'group', 'show' ]
-    group_list_command.append(group_id)
-    rc, output = dcos_cli(group_list_command)
-    if 'does not exist' in output:
+    marathon = client.marathon()
+    result = marathon.get('/groups{}'.format(group_id), cache=False)
+    if result['status_code'] == 404:
         # group doesn't exist
         return False
-    group_list = json.loads(output)
-    if len(group_list['apps']) != 0:
+    if result['failed']:
+        module.fail_json(msg='Failed to read group', debug=result)
+    if len(result['json'].get('apps', [])) != 0:
         # group contains other packages
         return False
-    group_delete_command = [ 'marathon', 'group', 'remove' ]
-    group_delete_command.append(group_id)
-    rc, output = dcos_cli(group_delete_command)
-    if rc != 0:
-        module.fail_json(msg='Failed to delete group',
-                debug={'output': output, 'deletecommand': group_delete_command})
+    result = marathon.delete('/groups{}'.format(group_id))
+    if result['failed']:
+        module.fail_json(msg='Failed to delete group', debug=result)
     return True
 
 
-def dcos_package_absent(params):
-    installed, package_list = _check_installed_packages(params)
+def dcos_package_absent(client, params):
+    installed, package_list = _check_installed_packages(client, params)
     if not installed:
-        group_clean = _clean_up_group(params)
+        group_clean = _clean_up_group(client, params)
         return group_clean or False, package_list
 
-    uninstall_command = ['package', 'uninstall',
-                            '--app-id={}'.format(params['app_id']),
-                            params['package']]
-    rc, output = dcos_cli(uninstall_command)
-    if rc != 0:
-        module.fail_json(msg='Failed to uninstall package',
-                debug={'output': output, 'uninstall_command': uninstall_command})
+    body = {
+        'packageName': params['package'],
+        'appId': params['app_id'],
+    }
+    result = dcos.cosmos(client, 'uninstall', body)
+    if result['failed']:
+        module.fail_json(msg='Failed to uninstall package', debug=result)
+    _update_index(params, None)
 
-    _clean_up_group(params)
+    _clean_up_group(client, params)
 
     return True, params
 
 
-def dcos_package_present(params):
-    installed, package_list = _check_installed_packages(params)
+def dcos_package_present(client, params):
+    installed, package_list = _check_installed_packages(client, params)
     if installed:
         return False, package_list
 
     # package is missing, install it
-    fd, path = tempfile.mkstemp()
-    with os.fdopen(fd, 'w') as f:
-        json.dump(params['options'], f)
-    install_command = [ 'package', 'install', params['package'], '--yes' ]
-    install_command.append('--app-id={}'.format(params['app_id']))
-    install_command.append('--options={}'.format(path))
-    rc, output = dcos_cli(install_command)
-    if rc != 0:
-        module.fail_json(msg='Installation failed', debug=output)
-    os.remove(path)
+    body = {
+        'packageName': params['package'],
+        'appId': params['app_id'],
+        'options': params['options'],
+    }
+    result = dcos.cosmos(client, 'install', body)
+    if result['failed']:
+        module.fail_json(msg='Installation failed', debug=result)
+    _update_index(params, params['package'])
+    meta = result.get('json', {})
+
+    if params['wait']:
+        marathon = client.marathon()
+        ready, apps = dcos.wait_for_apps(marathon, [params['app_id']],
+                                         params['timeout'], params['poll_interval'])
+        if not ready:
+            module.fail_json(msg='Timed out waiting for {} to become healthy'.format(params['app_id']),
+                    changed=True, debug=apps.get(params['app_id']))
+        meta['app'] = apps[params['app_id']]
+
+    return True, meta
 
-    # TODO: conditionally poll for successful startup (needed for jenkins)
 
-    return False, output
+def dcos_package_check(client, params):
+    installed, package_list = _check_installed_packages(client, params)
+    package = {'app_id': params['app_id'], 'package': params['package']}
+    before = package if installed else {}
+    after = package if params['state'] == 'present' else {}
+    module.exit_json(perf=client.perf, **dcos.check_result(before, after))
 
 
 def main():
@@ -171,16 +266,23 @@ def main():
             'default': 'present',
             'choices': [ 'present', 'absent' ]
         },
+        'index_file': { 'type': 'path', 'required': False },
+        'index_ttl': { 'type': 'int', 'required': False, 'default': 300 },
+        'wait': { 'type': 'bool', 'required': False, 'default': False },
+        'timeout': { 'type': 'int', 'required': False, 'default': 600 },
+        'poll_interval': { 'type': 'float', 'required': False, 'default': 2 },
         'delete_empty_group': { 'type': 'bool', 'required': False, 'default': True },
-    })
+    }, supports_check_mode=True)
+    if module.params['state'] == 'present' and not module.params['options']:
+        module.fail_json(msg='Options required for state=present')
+    client = dcos.DcosClient(service_path='/package')
+    if module.check_mode:
+        dcos_package_check(client, module.params)
     if module.params['state'] == 'present':
-        if module.params['options']:
-            has_changed, meta = dcos_package_present(module.params)
-        else:
-            module.fail_json(msg='Options required for state=present')
+        has_changed, meta = dcos_package_present(client, module.params)
     else:
-        has_changed, meta = dcos_package_absent(module.params)
-    module.exit_json(changed=has_changed, meta=meta)
+        has_changed, meta = dcos_package_absent(client, module.params)
+    module.exit_json(changed=has_changed, meta=meta, perf=client.perf)
 
 
 if __name__ == '__main__':
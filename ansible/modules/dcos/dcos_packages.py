@@ -0,0 +1,205 @@
+#!/usr/bin/python
+
+DOCUMENTATION = '''
+---
+module: dcos_packages
+short_description: Manage many packages on DCOS at once
+description:
+    - Read the installed packages once, then install and uninstall the
+      listed packages concurrently and optionally wait for all of the
+      installed apps together.
+options:
+    packages:
+        description:
+            - List of packages. Each item requires C(package) and C(app_id)
+            and may set C(options) and C(state) (C(present) or C(absent),
+            defaults to C(present)).
+        required: true
+    concurrency:
+        description:
+            - Maximum number of install or uninstall requests in flight.
+        required: false
+        default: 10
+    wait:
+        description:
+            - Wait until every installed app is deployed and healthy.
+            Defaults to C(false).
+        required: false
+        default: false
+    timeout:
+        description:
+            - Seconds to wait for the apps when C(wait) is true.
+        required: false
+        default: 600
+    poll_interval:
+        description:
+            - Initial seconds between Marathon polls.
+        required: false
+        default: 2
+    delete_empty_group:
+        description:
+            - Delete the marathon groups left empty by the uninstalled
+            packages. Defaults to C(true).
+        required: false
+        default: true
+'''
+
+EXAMPLES = '''
+- name: Install and remove packages
+  dcos_packages:
+    packages:
+      - package: kafka
+        app_id: "/tenant-a/kafka"
+        options:
+          service:
+            name: "tenant-a/kafka"
+      - package: jenkins
+        app_id: "/tenant-b/jenkins"
+        state: absent
+    concurrency: 20
+    wait: true
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils import dcos
+
+
+def _installed_packages(client):
+    result = dcos.cosmos(client, 'list', {})
+    if result['failed']:
+        module.fail_json(msg='Failed to list packages', debug=result)
+    installed = {}
+    for package in result['json'].get('packages', []):
+        installed[package.get('appId')] = dcos.cosmos_package_name(package)
+    return installed
+
+
+def _plan(params, installed):
+    items = []
+    for item in params['packages']:
+        if 'package' not in item or 'app_id' not in item:
+            module.fail_json(msg='package and app_id are required for every item', item=item)
+        state = item.get('state', 'present')
+        name = installed.get(item['app_id'])
+        entry = {
+            'package': item['package'],
+            'app_id': item['app_id'],
+            'state': state,
+            'changed': False,
+            'failed': False,
+        }
+        if name and name != item['package']:
+            entry['failed'] = True
+            entry['msg'] = 'Wrong package ({}) installed at app_id'.format(name)
+        elif state == 'present' and not name:
+            entry['operation'] = dcos.cosmos_operation('install', {
+                'packageName': item['package'],
+                'appId': item['app_id'],
+                'options': item.get('options') or {},
+            })
+        elif state == 'absent' and name:
+            entry['operation'] = dcos.cosmos_operation('uninstall', {
+                'packageName': item['package'],
+                'appId': item['app_id'],
+            })
+        items.append(entry)
+    return items
+
+
+def _clean_up_groups(marathon, items):
+    group_ids = set()
+    for item in items:
+        appid = item['app_id']
+        if item['state'] == 'absent' and appid.rfind('/') > 0:
+            group_ids.add(appid[:appid.rfind('/')])
+    group_ids = sorted(group_ids)
+    # never from the response cache, an outdated read would delete apps
+    results = marathon.batch([('get', '/groups{}'.format(g), False) for g in group_ids])
+    empty = [g for g, r in zip(group_ids, results)
+             if r.get('status_code') == 200 and not r['json'].get('apps')]
+    results = marathon.batch([('delete', '/groups{}'.format(g)) for g in empty])
+    return [g for g, r in zip(empty, results) if not r['failed']]
+
+
+def dcos_packages(params):
+    client = dcos.DcosClient(service_path='/package', pool_size=params['concurrency'])
+    items = _plan(params, _installed_packages(client))
+
+    pending = [item for item in items if 'operation' in item]
+    planned = [(item['operation'][1].lstrip('/'), item['app_id']) for item in pending]
+    if module.check_mode:
+        for item in pending:
+            item.pop('operation')
+            item['changed'] = True
+        failed = [item for item in items if item['failed']]
+        result = {
+            'changed': bool(pending),
+            'rc': 1 if failed else 0,
+            'failed': bool(failed),
+            'results': items,
+            'diff': dcos.operations_diff(planned),
+            'perf': client.perf,
+        }
+        if failed:
+            module.fail_json(msg='{} of {} packages failed'.format(len(failed), len(items)), **result)
+        module.exit_json(**result)
+
+    results = client.batch([item.pop('operation') for item in pending],
+                           params['concurrency'])
+    for item, result in zip(pending, results):
+        if result['failed']:
+            item['failed'] = True
+            item['msg'] = result.get('msg')
+            item['status_code'] = result.get('status_code')
+        else:
+            item['changed'] = True
+
+    marathon = client.marathon()
+    deleted_groups = []
+    if params['delete_empty_group'] and any(i['changed'] and i['state'] == 'absent' for i in items):
+        deleted_groups = _clean_up_groups(marathon, items)
+
+    if params['wait']:
+        app_ids = [i['app_id'] for i in items if i['state'] == 'present' and not i['failed']]
+        ready, apps = dcos.wait_for_apps(marathon, app_ids,
+                                         params['timeout'], params['poll_interval'])
+        for item in items:
+            if item['app_id'] not in app_ids:
+                continue
+            app = apps.get(item['app_id'])
+            item['ready'] = bool(app) and dcos.app_is_ready(app)
+            if not item['ready']:
+                item['failed'] = True
+                item['msg'] = 'Timed out waiting for the app to become healthy'
+
+    failed = [item for item in items if item['failed']]
+    result = {
+        'changed': any(item['changed'] for item in items) or bool(deleted_groups),
+        'rc': 1 if failed else 0,
+        'failed': bool(failed),
+        'results': items,
+        'deleted_groups': deleted_groups,
+        'perf': client.perf,
+    }
+    if module._diff:
+        result['diff'] = dcos.operations_diff(planned)
+    if failed:
+        module.fail_json(msg='{} of {} packages failed'.format(len(failed), len(items)), **result)
+    module.exit_json(**result)
+
+
+def main():
+    global module
+    module = AnsibleModule(argument_spec={
+        'packages': { 'type': 'list', 'required': True },
+        'concurrency': { 'type': 'int', 'required': False, 'default': 10 },
+        'wait': { 'type': 'bool', 'required': False, 'default': False },
+        'timeout': { 'type': 'int', 'required': False, 'default': 600 },
+        'poll_interval': { 'type': 'float', 'required': False, 'default': 2 },
+        'delete_empty_group': { 'type': 'bool', 'required': False, 'default': True },
+    }, supports_check_mode=True)
+    dcos_packages(module.params)
+
+
+if __name__ == '__main__':
+    main()
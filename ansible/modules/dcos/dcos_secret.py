@@ -17,6 +17,15 @@ options:
         description:
             - Value of secret.
         required: false
+    strategy:
+        description:
+            - With C(put_first), try to create the secret and fall back to
+            patching it on conflict. With C(read_first), read the secret
+            once and send only the one write needed, if any.
+            Defaults to C(put_first).
+        required: false
+        default: put_first
+        choices: [ put_first, read_first ]
     state:
         description:
             - If C(present), ensure the secret exists with all the given
@@ -39,7 +48,7 @@ EXAMPLES = '''
      state: absent
 '''
 
-from ansible.module_utils.basic import *
+from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils import dcos
 
 
@@ -68,6 +77,52 @@ def dcos_secret_present(params):
     module.exit_json(**result)
 
 
+def dcos_secret_present_read_first(params):
+    client = dcos.DcosClient(service_path='/secrets/v1')
+    body = {
+        params['key']: params['value']
+    }
+    path = '/secret/default/{}'.format(params['path'])
+    result, secret = dcos.read_object(client, path)
+    if result['failed']:
+        module.fail_json(**result)
+    if secret is None:
+        result = client.put(path, body)
+        if result['status_code'] == 409:
+            # created since it was read, compare against the secret as it is now
+            result, secret = dcos.read_object(client, path, cache=False)
+            if result['failed'] or secret is None:
+                result.pop('json', None)
+                result.setdefault('msg', 'Failed to read secret {}'.format(params['path']))
+                module.fail_json(**result)
+    if secret is not None and secret.get(params['key']) != params['value']:
+        result = client.patch(path, body)
+    result.pop('json', None)
+    result.pop('request_body', None)
+    if result['failed'] or result['status_code'] == 409:
+        result.setdefault('msg', 'Failed to write secret {}'.format(params['path']))
+        module.fail_json(**result)
+    module.exit_json(**result)
+
+
+def dcos_secret_check(params):
+    client = dcos.DcosClient(service_path='/secrets/v1')
+    path = '/secret/default/{}'.format(params['path'])
+    result, secret = dcos.read_object(client, path)
+    if result['failed']:
+        module.fail_json(**result)
+    # values are never shown, only whether they would change
+    before = {}
+    if secret is not None:
+        before = {'path': params['path'], 'value': 'hidden'}
+    after = {}
+    if params['state'] == 'present':
+        after = {'path': params['path'], 'value': 'hidden'}
+        if secret is not None and secret.get(params['key']) != params['value']:
+            after['value'] = 'hidden, changed'
+    module.exit_json(perf=client.perf, **dcos.check_result(before, after))
+
+
 def dcos_secret_get(params):
     client = dcos.DcosClient(service_path='/secrets/v1')
     path = '/secret/default/{}'.format(params['path'])
@@ -84,18 +139,30 @@ def main():
         'path': { 'type': 'str', 'required': True },
         'key': { 'type': 'str', 'required': False, 'default': 'value' },
         'value': { 'type': 'str', 'required': False },
+        'strategy': {
+            'type': 'str',
+            'required': False,
+            'default': 'put_first',
+            'choices': [ 'put_first', 'read_first' ]
+        },
         'state': {
             'type': 'str',
             'required': False,
             'default': 'present',
             'choices': [ 'present', 'absent' ]
         },
-    })
+    }, supports_check_mode=True)
     if module.params['state'] == 'present':
         if (module.params['value']):
+            if module.check_mode:
+                dcos_secret_check(module.params)
+            if module.params['strategy'] == 'read_first':
+                dcos_secret_present_read_first(module.params)
             dcos_secret_present(module.params)
         else:
             dcos_secret_get(module.params)
+    if module.check_mode:
+        dcos_secret_check(module.params)
     dcos_secret_absent(module.params)
 
 
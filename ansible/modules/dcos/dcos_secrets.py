@@ -0,0 +1,171 @@
+#!/usr/bin/python
+
+DOCUMENTATION = '''
+---
+module: dcos_secrets
+short_description: Manage many secrets on DCOS at once
+description:
+    - List the secrets under a prefix once, read the existing ones that
+      are declared, and concurrently write only the secrets that are
+      missing or whose value differs. Secret values are never returned.
+options:
+    secrets:
+        description:
+            - Mapping of secret path to value.
+        required: true
+    prefix:
+        description:
+            - Path under which all of the secrets live. Only this part of
+            the store is listed, declaring a secret outside of it is an
+            error.
+        required: false
+        default: ""
+    store:
+        description:
+            - Secret store to write to.
+        required: false
+        default: default
+    key:
+        description:
+            - key of the secrets.
+        required: false
+        default: value
+    concurrency:
+        description:
+            - Maximum number of requests in flight at once.
+        required: false
+        default: 10
+'''
+
+EXAMPLES = '''
+- name: Push the secrets of an environment
+  dcos_secrets:
+     prefix: "azurediamond"
+     secrets:
+       "azurediamond/password": "hunter2"
+       "azurediamond/api-key": "{{ api_key }}"
+'''
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils import dcos
+
+
+def _existing_paths(client, params):
+    prefix = params['prefix'].strip('/')
+    result = client.get('/secret/{}/{}?list=true'.format(params['store'], prefix))
+    if result['status_code'] == 404:
+        return set()
+    if result['failed']:
+        module.fail_json(msg='Failed to list secrets', status_code=result['status_code'])
+    names = result.get('json', {}).get('array', [])
+    if prefix:
+        return set('{}/{}'.format(prefix, name) for name in names)
+    return set(names)
+
+
+def _strip(path, result):
+    return {
+        'path': path,
+        'changed': result['changed'],
+        'failed': result['failed'],
+        'status_code': result.get('status_code'),
+        'request_action': result.get('request_action'),
+    }
+
+
+def dcos_secrets(params):
+    secrets = dict((path.strip('/'), value) for path, value in params['secrets'].items())
+    prefix = params['prefix'].strip('/')
+    outside = sorted(path for path in secrets if prefix and not path.startswith(prefix + '/'))
+    if outside:
+        module.fail_json(msg='Secrets outside of prefix {}'.format(prefix), paths=outside)
+
+    client = dcos.DcosClient(service_path='/secrets/v1', pool_size=params['concurrency'])
+    existing = _existing_paths(client, params)
+    endpoint = '/secret/' + params['store'] + '/{}'
+
+    present = sorted(path for path in secrets if path in existing)
+    reads = client.batch([('get', endpoint.format(path)) for path in present],
+                         params['concurrency'])
+    results = {}
+    operations = []
+    for path, result in zip(present, reads):
+        if result['failed']:
+            results[path] = _strip(path, result)
+        elif result.get('json', {}).get(params['key']) != secrets[path]:
+            operations.append((path, 'patch'))
+        else:
+            results[path] = _strip(path, result)
+    for path in sorted(set(secrets) - existing):
+        operations.append((path, 'put'))
+    planned = [(action, endpoint.format(path)) for path, action in operations]
+
+    if module.check_mode:
+        for path, action in operations:
+            results[path] = {'path': path, 'changed': True, 'failed': False,
+                             'request_action': action}
+        module.exit_json(changed=bool(operations), rc=0, failed=False,
+                         results=[results[path] for path in sorted(results)],
+                         diff=dcos.operations_diff(planned), perf=client.perf)
+
+    writes = client.batch(
+        [(action, endpoint.format(path), {params['key']: secrets[path]})
+         for path, action in operations],
+        params['concurrency'])
+    for (path, action), result in zip(operations, writes):
+        results[path] = _strip(path, result)
+
+    # a secret missing from the listing may still exist, read and patch
+    # it rather than reporting the conflict as success
+    conflicts = sorted(path for (path, action), result in zip(operations, writes)
+                       if action == 'put' and result.get('status_code') == 409)
+    planned = [op for op in planned if op not in [('put', endpoint.format(p)) for p in conflicts]]
+    reads = client.batch([('get', endpoint.format(path), False) for path in conflicts],
+                         params['concurrency'])
+    patches = []
+    for path, result in zip(conflicts, reads):
+        if result['failed']:
+            results[path] = _strip(path, result)
+        elif result.get('json', {}).get(params['key']) != secrets[path]:
+            patches.append(path)
+        else:
+            results[path] = _strip(path, result)
+    writes = client.batch(
+        [('patch', endpoint.format(path), {params['key']: secrets[path]}) for path in patches],
+        params['concurrency'])
+    for path, result in zip(patches, writes):
+        results[path] = _strip(path, result)
+        planned.append(('patch', endpoint.format(path)))
+    for result in results.values():
+        if result['status_code'] == 409:
+            result['failed'] = True
+
+    failed = [r for r in results.values() if r['failed']]
+    result = {
+        'changed': any(r['changed'] for r in results.values()),
+        'rc': 1 if failed else 0,
+        'failed': bool(failed),
+        'results': [results[path] for path in sorted(results)],
+        'perf': client.perf,
+    }
+    if module._diff:
+        result['diff'] = dcos.operations_diff(planned)
+    if failed:
+        module.fail_json(msg='{} of {} secrets failed'.format(len(failed), len(results)), **result)
+    module.exit_json(**result)
+
+
+def main():
+    global module
+    module = AnsibleModule(argument_spec={
+        'secrets': { 'type': 'dict', 'required': True, 'no_log': True },
+        'prefix': { 'type': 'str', 'required': False, 'default': '' },
+        'store': { 'type': 'str', 'required': False, 'default': 'default' },
+        'key': { 'type': 'str', 'required': False, 'default': 'value' },
+        'concurrency': { 'type': 'int', 'required': False, 'default': 10 },
+    }, supports_check_mode=True)
+    dcos_secrets(module.params)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,13 @@ DOCUMENTATION = '''
 ---
 module: dcos_token
 short_description: Get DCOS token
+options:
+    cache_file:
+        description:
+            - File used to share the token between module runs. It is
+            written with mode 0600 and the token is refreshed shortly
+            before it expires.
+        required: false
 '''
 
 EXAMPLES = '''
@@ -12,24 +19,37 @@ EXAMPLES = '''
     register: "dcos_token"
 '''
 
-from ansible.module_utils.basic import *
+from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils import dcos
 
 
-def get_token():
-    client = dcos.DcosClient()
+def get_token(config=None, config_path=None, cache_file=None):
+    # keyed on the cluster too, the configuration may point to another one
+    core = config if config is not None else dcos.read_configuration(config_path)
+    key = core.get('dcos_url', '')
+    if config is None:
+        key = '{} {}'.format(config_path or dcos.config_path(), key)
+    token = dcos.get_cached_token(key, cache_file)
+    if not token:
+        # a fresh token in dcos.toml needs no client, nor its imports
+        token = core.get('dcos_acs_token')
+        if not dcos.token_is_fresh(token):
+            token = dcos.DcosClient(config=config, config_path=config_path, broker=False).token
+        dcos.set_cached_token(key, token, cache_file)
     return {
         'changed': False,
         'rc': 0,
         'failed': False,
-        'value': client.token,
+        'value': token,
     }
 
 
 def main():
     global module
-    module = AnsibleModule(argument_spec={})
-    module.exit_json(**get_token())
+    module = AnsibleModule(argument_spec={
+        'cache_file': { 'type': 'path', 'required': False },
+    }, supports_check_mode=True)
+    module.exit_json(**get_token(cache_file=module.params['cache_file']))
 
 
 if __name__ == '__main__':
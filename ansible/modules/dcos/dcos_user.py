@@ -24,6 +24,33 @@ options:
             always result in C(changed=true).
         required: false
         default: false
+    strategy:
+        description:
+            - With C(put_first), try to create the user and fall back to
+            reading and patching it on conflict. With C(read_first), read
+            the user once and send only the one write needed, if any.
+            Defaults to C(put_first).
+        required: false
+        default: put_first
+        choices: [ put_first, read_first ]
+    prefetch:
+        description:
+            - With C(strategy=read_first), look the user up in the C(/users)
+            list instead of reading it directly. Combined with the response
+            cache (C(DCOS_HTTP_CACHE_DIR) and C(DCOS_HTTP_CACHE_TTL)) many
+            tasks are checked against a single list response.
+        required: false
+        default: false
+    snapshot:
+        description:
+            - IAM snapshot gathered by C(dcos_iam_facts). When it shows that
+            nothing needs to change the module returns without contacting
+            the cluster.
+        required: false
+    snapshot_path:
+        description:
+            - Path of a snapshot written by C(dcos_iam_facts) with C(dest).
+        required: false
     state:
         description:
             - If C(present), ensure the user account exists. If C(absent),
@@ -42,13 +69,22 @@ EXAMPLES = '''
      password: "s3cr3t"
      description: "My first user account"
 
+- name: Converge many DCOS users against one list response
+  dcos_user:
+     uid: "{{ item.uid }}"
+     password: "{{ item.password }}"
+     description: "{{ item.description }}"
+     strategy: read_first
+     prefetch: true
+  with_items: "{{ users }}"
+
 - name: Remove a DCOS user
   dcos_user:
      uid: "myusername"
      state: absent
 '''
 
-from ansible.module_utils.basic import *
+from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils import dcos
 
 
@@ -72,7 +108,7 @@ def dcos_user_present(params):
 
     changed = False
     body = {}
-    result = client.get('/users/{}'.format(params['uid']))
+    result = client.get('/users/{}'.format(params['uid']), cache=False)
     description = result['json'].get('description')
     if description != params['description']:
         changed = True
@@ -91,6 +127,77 @@ def dcos_user_present(params):
     module.fail_json(**result)
 
 
+def dcos_user_present_read_first(params):
+    client = dcos.DcosClient()
+    path = '/users/{}'.format(params['uid'])
+    list_path = '/users' if params['prefetch'] else None
+    result, user = dcos.read_object(client, path, list_path, 'uid', params['uid'])
+    if result['failed']:
+        module.fail_json(**result)
+    if user is None:
+        body = {
+            'description': params['description'],
+            'password': params['password'],
+        }
+        result = client.put(path, body=body)
+        if result['changed']:
+            module.exit_json(**result)
+        if result['status_code'] != 409:
+            result.setdefault('msg', 'Failed to create user {}'.format(params['uid']))
+            module.fail_json(**result)
+        # created since it was read, compare against the user as it is now
+        result, user = dcos.read_object(client, path, cache=False)
+        if result['failed'] or user is None:
+            result.setdefault('msg', 'Failed to read user {}'.format(params['uid']))
+            module.fail_json(**result)
+
+    body = {}
+    if user.get('description') != params['description']:
+        body['description'] = params['description']
+    if params['reset_password']:
+        body['password'] = params['password']
+    if not body:
+        module.exit_json(**result)
+
+    result = client.patch(path, body=body)
+    if result['status_code'] == 204:
+        module.exit_json(**result)
+    result.setdefault('msg', 'Failed to update user {}'.format(params['uid']))
+    module.fail_json(**result)
+
+
+def dcos_user_check(params, snapshot):
+    if snapshot:
+        user = snapshot['users'].get(params['uid'])
+        result = {}
+    else:
+        client = dcos.DcosClient()
+        path = '/users/{}'.format(params['uid'])
+        list_path = '/users' if params['prefetch'] else None
+        result, user = dcos.read_object(client, path, list_path, 'uid', params['uid'])
+        if result['failed']:
+            module.fail_json(**result)
+        result = {'perf': client.perf}
+    before = {}
+    if user is not None:
+        before = {'uid': params['uid'], 'description': user.get('description')}
+    after = {}
+    if params['state'] == 'present':
+        after = {'uid': params['uid'], 'description': params['description']}
+    changed = before != after or \
+        (user is not None and params['state'] == 'present' and params['reset_password'])
+    result.update(dcos.check_result(before, after, changed))
+    module.exit_json(**result)
+
+
+def _unchanged_in_snapshot(params, snapshot):
+    user = snapshot['users'].get(params['uid'])
+    if params['state'] == 'absent':
+        return user is None
+    return user is not None and not params['reset_password'] and \
+        user.get('description') == params['description']
+
+
 def main():
     global module
     module = AnsibleModule(argument_spec={
@@ -98,18 +205,34 @@ def main():
         'password': { 'type': 'str', 'required': False },
         'description': { 'type': 'str', 'required': False },
         'reset_password': { 'type': 'bool', 'required': False, 'default': False },
+        'strategy': {
+            'type': 'str',
+            'required': False,
+            'default': 'put_first',
+            'choices': [ 'put_first', 'read_first' ]
+        },
+        'prefetch': { 'type': 'bool', 'required': False, 'default': False },
+        'snapshot': { 'type': 'dict', 'required': False },
+        'snapshot_path': { 'type': 'path', 'required': False },
         'state': {
             'type': 'str',
             'required': False,
             'default': 'present',
             'choices': [ 'present', 'absent' ]
         },
-    })
+    }, supports_check_mode=True)
+    snapshot = dcos.load_iam_snapshot(module.params)
+    if module.params['state'] == 'present' and \
+            not (module.params['password'] and module.params['description']):
+        module.fail_json(msg="Password and description required for state=present", rc=1)
+    if module.check_mode:
+        dcos_user_check(module.params, snapshot)
+    if snapshot and _unchanged_in_snapshot(module.params, snapshot):
+        module.exit_json(**dcos.snapshot_result())
     if module.params['state'] == 'present':
-        if module.params['password'] and module.params['description']:
-            dcos_user_present(module.params)
-        else:
-            module.fail_json(msg="Password and description required for state=present", rc=1)
+        if module.params['strategy'] == 'read_first':
+            dcos_user_present_read_first(module.params)
+        dcos_user_present(module.params)
     else:
         dcos_user_absent(module.params)
 
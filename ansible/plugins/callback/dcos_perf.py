@@ -0,0 +1,84 @@
+# DC/OS Performance Callback Plugin
+#
+# Aggregates the request timings that the DC/OS modules return under their
+# perf key and prints p50/p95/p99 tables per endpoint and per module at the
+# end of the playbook run. Enable it in ansible.cfg:
+#
+#    [defaults]
+#    callback_whitelist = dcos_perf
+#
+import math
+
+from ansible.plugins.callback import CallbackBase
+
+
+def endpoint_pattern(record):
+    # /users/bob -> /users/*, /acls/rid/users/uid/read -> /acls/*/users/*/read
+    path = (record.get('endpoint') or '').split('?')[0]
+    segments = path.strip('/').split('/')
+    for i in range(1, len(segments), 2):
+        segments[i] = '*'
+    return '{} {}/{}'.format(record['action'].upper(),
+                             (record.get('service') or '').rstrip('/'),
+                             '/'.join(segments))
+
+
+def percentile(values, p):
+    index = int(math.ceil(p / 100.0 * len(values))) - 1
+    return values[max(0, index)]
+
+
+class CallbackModule(CallbackBase):
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'dcos_perf'
+    CALLBACK_NEEDS_WHITELIST = True
+
+    def __init__(self, *args, **kwargs):
+        super(CallbackModule, self).__init__(*args, **kwargs)
+        self.by_endpoint = {}
+        self.by_module = {}
+        self.totals = {'requests': 0, 'retries': 0, 'new_connections': 0,
+                       'bytes_sent': 0, 'bytes_received': 0}
+
+    def _collect(self, result):
+        data = result._result
+        records = list(data.get('perf') or [])
+        for item in data.get('results') or []:
+            if isinstance(item, dict):
+                records.extend(item.get('perf') or [])
+        module = result._task.action
+        for record in records:
+            total = record.get('total', 0)
+            self.by_endpoint.setdefault(endpoint_pattern(record), []).append(total)
+            self.by_module.setdefault(module, []).append(total)
+            self.totals['requests'] += 1
+            for key in ('retries', 'new_connections', 'bytes_sent', 'bytes_received'):
+                self.totals[key] += record.get(key) or 0
+
+    def v2_runner_on_ok(self, result):
+        self._collect(result)
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._collect(result)
+
+    def _table(self, title, timings):
+        self._display.display('{:<60} {:>7} {:>8} {:>8} {:>8} {:>9}'.format(
+            title, 'count', 'p50', 'p95', 'p99', 'total'))
+        rows = sorted(timings.items(), key=lambda row: -sum(row[1]))
+        for name, values in rows:
+            values = sorted(values)
+            self._display.display('{:<60} {:>7} {:>8.3f} {:>8.3f} {:>8.3f} {:>9.3f}'.format(
+                name[:60], len(values), percentile(values, 50),
+                percentile(values, 95), percentile(values, 99), sum(values)))
+        self._display.display('')
+
+    def v2_playbook_on_stats(self, stats):
+        if not self.totals['requests']:
+            return
+        self._display.banner('DC/OS REQUEST TIMINGS (seconds)')
+        self._table('endpoint', self.by_endpoint)
+        self._table('module', self.by_module)
+        self._display.display(
+            '{requests} requests, {retries} retries, {new_connections} new connections, '
+            '{bytes_sent} bytes sent, {bytes_received} bytes received'.format(**self.totals))
@@ -0,0 +1,209 @@
+# DC/OS Inventory Plugin
+#
+# Builds hosts and groups from the Mesos agents and the tasks of the
+# Marathon apps. Enable it in ansible.cfg and point ansible at a file whose
+# name ends in dcos.yml:
+#
+#    [inventory]
+#    enable_plugins = dcos_inventory
+#
+#    # cluster.dcos.yml
+#    plugin: dcos_inventory
+#    cache_ttl: 300
+#
+# Every agent is a host in dcos_agents, public agents are also in
+# dcos_public_agents. The agents running tasks of an app are in a group
+# named after the app id, /tenant-a/kafka becomes marathon_tenant_a_kafka,
+# and list those tasks in their dcos_tasks variable.
+#
+# Marathon is read one group at a time, several groups concurrently, so no
+# single response holds every app and task of a large cluster. The result
+# is kept in cache_file and reused for cache_ttl seconds, ansible-inventory
+# --flush-cache reads the cluster again.
+#
+import json
+import os
+import re
+import time
+
+from ansible.errors import AnsibleError
+from ansible.plugins.inventory import BaseInventoryPlugin
+from ansible.module_utils import dcos
+
+
+DOCUMENTATION = '''
+    name: dcos_inventory
+    plugin_type: inventory
+    short_description: DC/OS agents and Marathon apps
+    description:
+        - Hosts are the Mesos agents, grouped by the Marathon apps running
+          tasks on them.
+    options:
+        plugin:
+            description: Must be C(dcos_inventory).
+            required: true
+            choices: [ dcos_inventory ]
+        config_path:
+            description: dcos.toml to read, defaults to C(~/.dcos/dcos.toml).
+            required: false
+        agents:
+            description: Add the Mesos agents.
+            default: true
+        apps:
+            description: Add the groups of the Marathon apps.
+            default: true
+        cache_file:
+            description: File the inventory is kept in between runs.
+            default: ~/.dcos/inventory.json
+        cache_ttl:
+            description: Seconds the cached inventory is used, 0 disables it.
+            default: 300
+        concurrency:
+            description: Maximum number of Marathon groups read at once.
+            default: 10
+'''
+
+DEFAULTS = {
+    'config_path': None,
+    'agents': True,
+    'apps': True,
+    'cache_file': '~/.dcos/inventory.json',
+    'cache_ttl': 300,
+    'concurrency': 10,
+}
+GROUP_EMBED = '?embed=group.apps&embed=group.apps.tasks'
+
+
+def group_name(prefix, name):
+    return '{}_{}'.format(prefix, re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_').lower())
+
+
+def _group_ids(group):
+    ids = [group['id']]
+    for child in group.get('groups', []):
+        ids.extend(_group_ids(child))
+    return ids
+
+
+def _read(client, endpoint):
+    result = client.get(endpoint)
+    if result['failed']:
+        raise AnsibleError('Error reading {}: {}'.format(result['request_url'], result.get('msg')))
+    return result.get('json', {})
+
+
+class Index:
+    # hosts by group and variables by host, filled in one pass over the
+    # agents and the tasks
+    def __init__(self):
+        self.groups = {}
+        self.hostvars = {}
+
+    def add(self, group, host):
+        self.groups.setdefault(group, set()).add(host)
+        return self.hostvars.setdefault(host, {})
+
+    def add_agents(self, agents):
+        for agent in agents:
+            attributes = agent.get('attributes', {})
+            hostvars = self.add('dcos_agents', agent['hostname'])
+            hostvars['dcos_agent_id'] = agent['id']
+            hostvars['dcos_agent_attributes'] = attributes
+            if attributes.get('public_ip') or 'slave_public' in agent.get('reserved_resources', {}):
+                self.add('dcos_public_agents', agent['hostname'])
+
+    def add_apps(self, apps):
+        for app in apps:
+            group = group_name('marathon', app['id'])
+            for task in app.get('tasks', []):
+                hostvars = self.add(group, task['host'])
+                hostvars.setdefault('dcos_tasks', []).append({
+                    'id': task['id'],
+                    'app_id': app['id'],
+                    'ports': task.get('ports', []),
+                })
+
+    def to_json(self):
+        return {
+            'groups': dict((g, sorted(hosts)) for g, hosts in self.groups.items()),
+            'hostvars': self.hostvars,
+        }
+
+
+def build_inventory(options):
+    marathon = dcos.DcosClient(service_path=dcos.MARATHON_SERVICE_PATH,
+                               config_path=options['config_path'],
+                               pool_size=options['concurrency'])
+    index = Index()
+    if options['agents']:
+        mesos = marathon.for_service('/mesos')
+        index.add_agents(_read(mesos, '/slaves').get('slaves', []))
+    if options['apps']:
+        gids = _group_ids(_read(marathon, '/groups?embed=group.groups'))
+        size = options['concurrency']
+        for i in range(0, len(gids), size):
+            operations = [('get', '/groups{}{}'.format(gid.rstrip('/'), GROUP_EMBED))
+                          for gid in gids[i:i + size]]
+            for result in marathon.batch(operations, size):
+                if result['failed']:
+                    raise AnsibleError('Error reading {}: {}'.format(
+                        result.get('request_url'), result.get('msg')))
+                index.add_apps(result.get('json', {}).get('apps', []))
+    return index.to_json()
+
+
+def read_cache(path, ttl, dcos_url):
+    try:
+        if time.time() - os.path.getmtime(path) > ttl:
+            return None
+        with open(path) as f:
+            inventory = json.load(f)
+    except (OSError, IOError, ValueError):
+        return None
+    if inventory.get('dcos_url') != dcos_url:
+        return None
+    return inventory
+
+
+def write_cache(path, inventory):
+    tmp = '{}.{}'.format(path, os.getpid())
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(inventory, f)
+    os.rename(tmp, path)
+
+
+class InventoryModule(BaseInventoryPlugin):
+    NAME = 'dcos_inventory'
+
+    def verify_file(self, path):
+        return super(InventoryModule, self).verify_file(path) and \
+            path.endswith(('dcos.yml', 'dcos.yaml'))
+
+    def parse(self, inventory, loader, path, cache=True):
+        super(InventoryModule, self).parse(inventory, loader, path, cache)
+        options = dict(DEFAULTS)
+        options.update(loader.load_from_file(path) or {})
+        if options.get('plugin') != self.NAME:
+            raise AnsibleError('{} is not a {} inventory'.format(path, self.NAME))
+
+        # the dcos_url tells cached inventories of other clusters apart
+        # without contacting this one
+        dcos_url = dcos.read_configuration(options['config_path']).get('dcos_url')
+        cache_file = os.path.expanduser(options['cache_file'] or '')
+        data = None
+        if cache and cache_file and options['cache_ttl'] > 0:
+            data = read_cache(cache_file, options['cache_ttl'], dcos_url)
+        if data is None:
+            data = build_inventory(options)
+            data['dcos_url'] = dcos_url
+            if cache_file and options['cache_ttl'] > 0:
+                write_cache(cache_file, data)
+
+        for group, hosts in sorted(data['groups'].items()):
+            self.inventory.add_group(group)
+            for host in hosts:
+                self.inventory.add_host(host, group=group)
+        for host, hostvars in data['hostvars'].items():
+            for key, value in hostvars.items():
+                self.inventory.set_variable(host, key, value)
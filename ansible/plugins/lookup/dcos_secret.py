@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+#
+# DC/OS Secret Lookup Plugin
+#
+# Reads secrets from the DC/OS secret store:
+#    ---
+#    - debug: msg="{{lookup('dcos_secret', 'tenant-a/db/password')}}"
+#
+# Several paths are read concurrently in one call and returned in order:
+#    - template: src=app.conf.j2 dest=/etc/app.conf
+#      vars:
+#        secrets: "{{query('dcos_secret', 'db/user', 'db/password', 'api/key')}}"
+#
+# The key read from every secret defaults to value and can be changed with
+# key, the store with store, the dcos.toml with config_path and the number
+# of requests in flight with concurrency.
+#
+# Secrets are kept in memory for the life of the process that renders the
+# template, so a path looked up again in the same task is not read twice.
+# They are never written to disk: the on disk response cache and the request
+# broker are not used.
+#
+# The plugin can be run manually for testing:
+#     python ansible/plugins/lookup/dcos_secret.py tenant-a/db/password
+#
+import sys
+
+from ansible.errors import AnsibleError
+from ansible.plugins.lookup import LookupBase
+from ansible.module_utils import dcos
+
+
+# secrets and clients of this process, keyed by cluster
+_secrets = {}
+_clients = {}
+
+
+def _client(config_path, concurrency):
+    client = _clients.get(config_path)
+    if client is None or not dcos.token_is_fresh(client.token):
+        client = dcos.DcosClient(service_path='/secrets/v1', config_path=config_path,
+                                 pool_size=concurrency, cache=False, broker=False)
+        _clients[config_path] = client
+    return client
+
+
+def read_secrets(paths, store='default', config_path=None, concurrency=dcos.DEFAULT_POOL_SIZE):
+    # the secrets at paths, reading the ones not seen before concurrently
+    client = _client(config_path, concurrency)
+    keys = [(client.dcos_url, store, path.strip('/')) for path in paths]
+    missing = sorted(set(k for k in keys if k not in _secrets))
+    results = client.batch([('get', '/secret/{}/{}'.format(store, k[2])) for k in missing],
+                           concurrency)
+    for key, result in zip(missing, results):
+        if result.get('status_code') == 404:
+            raise AnsibleError('DC/OS secret {} not found in store {}'.format(key[2], store))
+        if result['failed']:
+            raise AnsibleError('Error reading DC/OS secret {}: {}'.format(key[2], result.get('msg')))
+        _secrets[key] = result.get('json', {})
+    return [_secrets[k] for k in keys]
+
+
+class LookupModule(LookupBase):
+
+    def run(self, terms, variables=None, **kwargs):
+        key = kwargs.get('key', 'value')
+        secrets = read_secrets(terms, kwargs.get('store', 'default'),
+                               kwargs.get('config_path'),
+                               int(kwargs.get('concurrency', dcos.DEFAULT_POOL_SIZE)))
+        values = []
+        for path, secret in zip(terms, secrets):
+            if key not in secret:
+                raise AnsibleError('DC/OS secret {} has no {}'.format(path, key))
+            values.append(secret[key])
+        return values
+
+
+def main(argv=sys.argv[1:]):
+    for value in LookupModule().run(argv, None):
+        print value
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
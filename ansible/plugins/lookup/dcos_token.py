@@ -6,15 +6,16 @@
 #    ---
 #    - debug: msg="{{lookup('dcos_token')}}"
 #
+# An alternate dcos.toml can be given with config_path:
+#    - debug: msg="{{lookup('dcos_token', config_path='/etc/dcos/dcos.toml')}}"
+#
+# Tokens are kept in memory until shortly before they expire. They can also
+# be shared between runs through a 0600 file given with cache_file.
+#
 # The plugin can be run manually for testing:
 #     python ansible/plugins/lookup/dcos_token.py
 #
-import json
-import os
-import requests
 import sys
-from urlparse import urljoin
-import warnings
 
 from ansible.errors import AnsibleError
 from ansible.plugins.lookup import LookupBase
@@ -24,7 +25,8 @@ from ansible.modules.dcos import dcos_token
 class LookupModule(LookupBase):
 
     def run(self, terms, variables, **kwargs):
-        result = dcos_token.get_token()
+        result = dcos_token.get_token(config_path=kwargs.get('config_path'),
+                                      cache_file=kwargs.get('cache_file'))
         if 'value' not in result:
             raise AnsibleError('Error reading DC/OS token: %s' % result.get('msg', 'msg not set'))
         return [str(result['value'])]
@@ -0,0 +1,466 @@
+#!/usr/bin/env python
+# Fake DC/OS API server
+#
+# Keeps users, groups, ACLs, secrets, marathon apps, mesos agents and
+# packages in memory and serves the ACS IAM, secrets, marathon, mesos and
+# cosmos endpoints used by the modules and plugins, so they can be
+# exercised and benchmarked without a cluster.
+# Every request can be delayed and a share of them answered with an error.
+#
+#    python bench/fake_dcos.py --port 8080 --latency 0.01 --error-rate 0.01
+#
+# and point ~/.dcos/dcos.toml at it:
+#
+#    [core]
+#    dcos_url = "http://127.0.0.1:8080"
+#    dcos_acs_token = "fake"
+#
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import urlparse
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+
+IAM_PREFIX = '/acs/api/v1'
+SECRETS_PREFIX = '/secrets/v1'
+MARATHON_PREFIXES = ('/service/marathon/v2', '/marathon/v2', '/v2')
+COSMOS_PREFIX = '/package'
+MESOS_PREFIX = '/mesos'
+
+
+def _public(item):
+    # the fields of a user, group or acl that the api returns
+    return dict((k, v) for k, v in item.items() if not isinstance(v, (set, dict)))
+
+
+class FakeDcos:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.lock = threading.Lock()
+        self.leader = None
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.users = {}
+            self.groups = {}
+            self.acls = {}
+            self.secrets = {}
+            self.apps = {}
+            self.agents = {}
+            self.packages = {}
+            self.requests = 0
+            self.errors = 0
+
+    def stats(self):
+        with self.lock:
+            return {'requests': self.requests, 'errors': self.errors}
+
+    def handle(self, method, path, query, body):
+        # returns the status code and the json body of the response
+        with self.lock:
+            self.requests += 1
+            failing = self.error_rate and random.random() < self.error_rate
+            if failing:
+                self.errors += 1
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        if failing:
+            return self.error_status, {'message': 'injected error'}
+        with self.lock:
+            if path.startswith(IAM_PREFIX):
+                return self._iam(method, path[len(IAM_PREFIX):], body)
+            if path.startswith(SECRETS_PREFIX):
+                return self._secrets(method, path[len(SECRETS_PREFIX):], query, body)
+            for prefix in MARATHON_PREFIXES:
+                if path.startswith(prefix + '/'):
+                    return self._marathon(method, path[len(prefix):], query, body)
+            if path.startswith(COSMOS_PREFIX):
+                return self._cosmos(method, path[len(COSMOS_PREFIX):], body)
+            if path.startswith(MESOS_PREFIX):
+                return self._mesos(method, path[len(MESOS_PREFIX):])
+        return 404, {'message': 'Not found: {}'.format(path)}
+
+    # ACS IAM
+
+    def _objects(self, method, collection, name, body):
+        store, key = self._collection(collection)
+        if method == 'GET':
+            if name not in store:
+                return 400, {'code': 'ERR_UNKNOWN_{}_ID'.format(key.upper())}
+            return 200, _public(store[name])
+        if method == 'PUT':
+            if name in store:
+                return 409, {'code': 'ERR_{}_EXISTS'.format(key.upper())}
+            store[name] = {key: name, 'description': body.get('description', ''),
+                           'url': '{}/{}/{}'.format(IAM_PREFIX, collection, name)}
+            return 201, None
+        if method == 'PATCH':
+            if name not in store:
+                return 400, {'code': 'ERR_UNKNOWN_{}_ID'.format(key.upper())}
+            if 'description' in body:
+                store[name]['description'] = body['description']
+            return 204, None
+        if method == 'DELETE':
+            if store.pop(name, None) is None:
+                return 400, {'code': 'ERR_UNKNOWN_{}_ID'.format(key.upper())}
+            return 204, None
+        return 405, None
+
+    def _iam(self, method, path, body):
+        parts = [urlparse.unquote(p) for p in path.strip('/').split('/') if p]
+        if parts == ['auth', 'login'] and method == 'POST':
+            return 200, {'token': 'fake'}
+        if len(parts) == 1 and method == 'GET':
+            store, key = self._collection(parts[0])
+            if store is None:
+                return 404, None
+            return 200, {'array': [_public(item) for _, item in sorted(store.items())]}
+        if len(parts) == 2:
+            store, key = self._collection(parts[0])
+            if store is None:
+                return 404, None
+            status, data = self._objects(method, parts[0], parts[1], body)
+            if status == 201 and key == 'gid':
+                store[parts[1]]['members'] = set()
+            if status == 201 and key == 'rid':
+                store[parts[1]].update(users={}, groups={})
+            if method == 'DELETE' and status == 204:
+                self._forget(key, parts[1])
+            return status, data
+        if parts[:1] == ['groups'] and len(parts) >= 3 and parts[2] == 'users':
+            return self._members(method, parts[1], parts[3:])
+        if parts[:1] == ['acls'] and len(parts) >= 3:
+            return self._permissions(method, parts[1], parts[2:])
+        return 404, None
+
+    def _collection(self, name):
+        return {
+            'users': (self.users, 'uid'),
+            'groups': (self.groups, 'gid'),
+            'acls': (self.acls, 'rid'),
+        }.get(name, (None, None))
+
+    def _forget(self, key, name):
+        # drop the memberships and permissions of a deleted user or group
+        if key == 'uid':
+            for group in self.groups.values():
+                group['members'].discard(name)
+        kind = {'uid': 'users', 'gid': 'groups'}.get(key)
+        if kind:
+            for acl in self.acls.values():
+                acl[kind].pop(name, None)
+
+    def _members(self, method, gid, rest):
+        group = self.groups.get(gid)
+        if group is None:
+            return 400, {'code': 'ERR_UNKNOWN_GROUP_ID'}
+        if not rest and method == 'GET':
+            return 200, {'array': [{'user': self.users.get(uid, {'uid': uid})}
+                                   for uid in sorted(group['members'])]}
+        if len(rest) != 1:
+            return 404, None
+        uid = rest[0]
+        if method == 'PUT':
+            if uid not in self.users:
+                return 400, {'code': 'ERR_UNKNOWN_USER_ID'}
+            if uid in group['members']:
+                return 409, {'code': 'ERR_MEMBERSHIP_EXISTS'}
+            group['members'].add(uid)
+            return 204, None
+        if method == 'DELETE':
+            if uid not in group['members']:
+                return 400, {'code': 'ERR_UNKNOWN_MEMBERSHIP'}
+            group['members'].discard(uid)
+            return 204, None
+        return 405, None
+
+    def _permissions(self, method, rid, rest):
+        acl = self.acls.get(rid)
+        if acl is None:
+            return 400, {'code': 'ERR_UNKNOWN_RID'}
+        if rest == ['permissions'] and method == 'GET':
+            return 200, dict(
+                (kind, [{key: name, 'actions': [{'name': a} for a in sorted(actions)]}
+                        for name, actions in sorted(acl[kind].items())])
+                for kind, key in (('users', 'uid'), ('groups', 'gid')))
+        if len(rest) != 3 or rest[0] not in ('users', 'groups'):
+            return 404, None
+        kind, name, action = rest
+        owners = self.users if kind == 'users' else self.groups
+        actions = acl[kind].get(name, set())
+        if method == 'PUT':
+            if name not in owners:
+                return 400, {'code': 'ERR_UNKNOWN_ID'}
+            if action in actions:
+                return 409, {'code': 'ERR_PERMISSION_EXISTS'}
+            acl[kind][name] = actions | set([action])
+            return 204, None
+        if method == 'DELETE':
+            if action not in actions:
+                return 400, {'code': 'ERR_UNKNOWN_PERMISSION'}
+            actions.discard(action)
+            if not actions:
+                del acl[kind][name]
+            return 204, None
+        return 405, None
+
+    # secrets
+
+    def _secrets(self, method, path, query, body):
+        match = re.match(r'^/secret/([^/]+)/?(.*)$', path)
+        if not match:
+            return 404, None
+        store, name = match.group(1), match.group(2).strip('/')
+        if method == 'GET' and query.get('list') == ['true']:
+            prefix = name + '/' if name else ''
+            names = sorted(key[1][len(prefix):] for key in self.secrets
+                           if key[0] == store and key[1].startswith(prefix))
+            if not names:
+                return 404, None
+            return 200, {'array': names}
+        key = (store, name)
+        if method == 'GET':
+            if key not in self.secrets:
+                return 404, None
+            return 200, self.secrets[key]
+        if method == 'PUT':
+            if key in self.secrets:
+                return 409, {'code': 'ERR_SECRET_EXISTS'}
+            self.secrets[key] = body
+            return 201, None
+        if method == 'PATCH':
+            if key not in self.secrets:
+                return 404, None
+            self.secrets[key] = body
+            return 204, None
+        if method == 'DELETE':
+            if self.secrets.pop(key, None) is None:
+                return 404, None
+            return 204, None
+        return 405, None
+
+    # marathon
+
+    def add_app(self, app_id, instances=1, labels=None, definition=None):
+        # tasks are spread over the agents
+        hosts = sorted(self.agents) or ['127.0.0.1']
+        tasks = [{'id': '{}.{}'.format(app_id.strip('/').replace('/', '_'), i),
+                  'appId': app_id,
+                  'host': hosts[(len(self.apps) + i) % len(hosts)],
+                  'ports': [10000 + i]}
+                 for i in range(instances)]
+        self.apps[app_id] = dict(definition or {})
+        self.apps[app_id].update({
+            'id': app_id,
+            'instances': instances,
+            'tasksRunning': instances,
+            'tasksHealthy': instances,
+            'healthChecks': [],
+            'deployments': [],
+            'labels': labels or {},
+            'tasks': tasks,
+        })
+
+    def _deploy(self, apps):
+        for app in apps:
+            self.add_app(app['id'], app.get('instances', 1), app.get('labels'), app)
+        return {'deploymentId': 'fake', 'version': 'fake'}
+
+    def add_agent(self, hostname, attributes=None):
+        self.agents[hostname] = {
+            'id': 'agent-{}'.format(len(self.agents)),
+            'hostname': hostname,
+            'attributes': attributes or {},
+            'active': True,
+        }
+
+    def _app(self, app_id, tasks):
+        app = dict(self.apps[app_id])
+        if not tasks:
+            app.pop('tasks')
+        return app
+
+    def _group(self, group_id, embed):
+        # groups only exist through the ids of their apps
+        prefix = group_id + '/'
+        below = [a[len(prefix):] for a in sorted(self.apps) if a.startswith(prefix)]
+        children = sorted(set(prefix + a.split('/')[0] for a in below if '/' in a))
+        group = {'id': group_id or '/', 'apps': [], 'groups': []}
+        if 'group.groups' in embed:
+            group['groups'] = [self._group(child, embed) for child in children]
+        if 'group.apps' in embed:
+            group['apps'] = [self._app(prefix + a, 'group.apps.tasks' in embed)
+                             for a in below if '/' not in a]
+        return group
+
+    def _marathon(self, method, path, query, body):
+        if path == '/leader' and method == 'GET':
+            return 200, {'leader': self.leader}
+        if path == '/apps' and method == 'GET':
+            tasks = 'apps.tasks' in query.get('embed', [])
+            return 200, {'apps': [self._app(a, tasks) for a in sorted(self.apps)]}
+        if path == '/apps' and method == 'PUT':
+            return 200, self._deploy(body)
+        if path.startswith('/apps/'):
+            app_id = path[len('/apps'):]
+            if method == 'GET':
+                if app_id not in self.apps:
+                    return 404, {'message': 'App not found'}
+                return 200, {'app': self.apps[app_id]}
+            if method == 'PUT':
+                created = app_id not in self.apps
+                return (201 if created else 200), self._deploy([dict(body, id=app_id)])
+            if method == 'DELETE':
+                if self.apps.pop(app_id, None) is None:
+                    return 404, {'message': 'App not found'}
+                return 200, {'deploymentId': 'fake', 'version': 'fake'}
+        if path.startswith('/groups'):
+            group_id = path[len('/groups'):].rstrip('/')
+            apps = [self.apps[a] for a in sorted(self.apps)
+                    if a.startswith(group_id + '/')]
+            if method == 'GET':
+                if not apps and group_id:
+                    return 404, {'message': 'Group not found'}
+                if 'embed' in query:
+                    return 200, self._group(group_id, query['embed'])
+                return 200, {'id': group_id or '/', 'apps': apps, 'groups': []}
+            if method == 'PUT':
+                # the tree replaces the group, apps missing from it are removed
+                deployed = self._tree_apps(body)
+                for app in apps:
+                    if app['id'] not in deployed:
+                        del self.apps[app['id']]
+                return 200, self._deploy(deployed.values())
+            if method == 'DELETE':
+                for app in apps:
+                    del self.apps[app['id']]
+                return 200, {'deploymentId': 'fake', 'version': 'fake'}
+        return 404, None
+
+    def _tree_apps(self, group):
+        apps = dict((app['id'], app) for app in group.get('apps', []))
+        for child in group.get('groups', []):
+            apps.update(self._tree_apps(child))
+        return apps
+
+    # mesos
+
+    def _mesos(self, method, path):
+        if path == '/slaves' and method == 'GET':
+            return 200, {'slaves': [self.agents[a] for a in sorted(self.agents)]}
+        return 404, None
+
+    # cosmos
+
+    def _cosmos(self, method, path, body):
+        if method != 'POST':
+            return 405, None
+        if path == '/list':
+            app_id = body.get('appId')
+            return 200, {'packages': [
+                {'appId': a, 'packageInformation': {'packageDefinition': {
+                    'name': name, 'version': '1.0.0'}}}
+                for a, name in sorted(self.packages.items())
+                if not app_id or a == app_id]}
+        if path == '/install':
+            app_id = body.get('appId') or '/' + body['packageName']
+            if app_id in self.packages:
+                return 409, {'type': 'PackageAlreadyInstalled'}
+            self.packages[app_id] = body['packageName']
+            self.add_app(app_id)
+            return 200, {'appId': app_id, 'packageName': body['packageName'],
+                         'packageVersion': '1.0.0'}
+        if path == '/uninstall':
+            app_id = body.get('appId')
+            if self.packages.get(app_id) != body.get('packageName'):
+                return 404, {'type': 'PackageNotInstalled'}
+            del self.packages[app_id]
+            self.apps.pop(app_id, None)
+            return 200, {'results': [{'packageName': body['packageName'], 'appId': app_id}]}
+        return 404, None
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # send the headers and body in one write, not one per header line
+    wbufsize = -1
+
+    def _handle(self):
+        url = urlparse.urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = {}
+        if length:
+            try:
+                body = json.loads(self.rfile.read(length))
+            except ValueError:
+                body = {}
+        status, data = self.server.dcos.handle(self.command, url.path,
+                                               urlparse.parse_qs(url.query), body)
+        payload = json.dumps(data) if data is not None else ''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_PUT = do_POST = do_PATCH = do_DELETE = _handle
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeDcosServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    # the default backlog of 5 drops concurrent connects, which the client
+    # only retries after a second
+    request_queue_size = 128
+
+    def __init__(self, dcos, host='127.0.0.1', port=0):
+        HTTPServer.__init__(self, (host, port), Handler)
+        self.dcos = dcos
+        dcos.leader = '{}:{}'.format(*self.server_address)
+
+    @property
+    def url(self):
+        return 'http://{}:{}'.format(*self.server_address)
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake DC/OS API server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds added to every request')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='up to this many seconds added at random')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='share of requests answered with --error-status')
+    parser.add_argument('--error-status', type=int, default=503)
+    args = parser.parse_args()
+    dcos = FakeDcos(args.latency, args.jitter, args.error_rate, args.error_status)
+    server = FakeDcosServer(dcos, args.host, args.port)
+    print 'Serving fake DC/OS on {}'.format(server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
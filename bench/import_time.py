@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# DC/OS Modules Import Time Benchmark
+#
+# Loads every module in a fresh interpreter, the way ansible starts it but
+# without calling main(), and prints the median time spent importing the
+# module and its module_utils, the time of the whole process and which
+# heavy dependencies were loaded. ansible.module_utils.dcos is taken from
+# this tree and ansible.module_utils.basic from the installed ansible. basic
+# is imported before the clock starts, so neither its import time nor the
+# dependencies it loads itself (subprocess, ...) are counted. The results
+# can be saved and compared against a previous run:
+#
+#    python bench/import_time.py --output imports.json
+#    python bench/import_time.py --baseline imports.json
+#
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = os.path.join(ROOT, 'ansible', 'modules', 'dcos')
+MODULE_UTILS = os.path.join(ROOT, 'ansible', 'module_utils')
+HEAVY = ['requests', 'toml', 'subprocess', 'multiprocessing.pool', 'SocketServer', 'jwt']
+
+CHILD = '''
+import sys, time
+import ansible.module_utils
+ansible.module_utils.__path__.insert(0, {utils!r})
+import ansible.module_utils.basic
+before = set(sys.modules)
+start = time.time()
+import imp
+imp.load_source('ansible_module_{name}', {path!r})
+elapsed = time.time() - start
+import json
+print json.dumps({{'import': elapsed,
+                  'loaded': [m for m in {heavy!r} if m in sys.modules and m not in before]}})
+'''
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def measure(python, path, repeat):
+    name = os.path.splitext(os.path.basename(path))[0]
+    code = CHILD.format(utils=MODULE_UTILS, name=name, path=path, heavy=HEAVY)
+    imports, processes, loaded = [], [], []
+    for _ in range(repeat):
+        start = time.time()
+        # outside the tree, so the installed ansible package is imported
+        output = subprocess.check_output([python, '-c', code], cwd=tempfile.gettempdir())
+        processes.append(time.time() - start)
+        result = json.loads(output.splitlines()[-1])
+        imports.append(result['import'])
+        loaded = result['loaded']
+    return {
+        'module': name,
+        'import': median(imports),
+        'process': median(processes),
+        'loaded': loaded,
+    }
+
+
+def print_results(results, baseline):
+    previous = dict((r['module'], r) for r in baseline)
+    print '{:<22} {:>10} {:>11} {:>10}  {}'.format('module', 'import ms', 'process ms', 'was ms', 'loaded')
+    for r in results:
+        old = previous.get(r['module'])
+        print '{:<22} {:>10.1f} {:>11.1f} {:>10}  {}'.format(
+            r['module'], r['import'] * 1000, r['process'] * 1000,
+            '{:.1f}'.format(old['import'] * 1000) if old else '-', ' '.join(r['loaded']))
+
+
+def regressions(results, baseline, tolerance):
+    previous = dict((r['module'], r) for r in baseline)
+    found = []
+    for result in results:
+        old = previous.get(result['module'])
+        if old and result['import'] > old['import'] * (1 + tolerance):
+            found.append('{} imports in {:.1f}ms, was {:.1f}ms'.format(
+                result['module'], result['import'] * 1000, old['import'] * 1000))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the cold start import time of the DC/OS modules')
+    parser.add_argument('--modules', help='comma separated module names, defaults to all')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--python', default=sys.executable)
+    parser.add_argument('--output', help='write the results as json to this file')
+    parser.add_argument('--baseline', help='compare against the results in this file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed import time increase over the baseline')
+    args = parser.parse_args()
+
+    if args.modules:
+        paths = [os.path.join(MODULES, m + '.py') for m in args.modules.split(',')]
+    else:
+        paths = sorted(glob.glob(os.path.join(MODULES, 'dcos_*.py')))
+    results = [measure(args.python, path, args.repeat) for path in paths]
+
+    baseline = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    found = regressions(results, baseline, args.tolerance)
+    for line in found:
+        print 'REGRESSION: ' + line
+    sys.exit(1 if found else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# DC/OS Modules Benchmark
+#
+# Starts the fake DC/OS server, points a temporary ~/.dcos/dcos.toml at it
+# and runs generated playbooks that create, and then converge again,
+# users, groups, ACLs, secrets, packages and marathon apps at different
+# sizes. Each
+# resource is run once with the per object modules in a loop and once with
+# the bulk module. Wall time, tasks and objects per second and the number
+# of requests served are printed and can be saved and compared against a
+# previous run:
+#
+#    python bench/run.py --sizes 10,1000 --output bench.json
+#    python bench/run.py --sizes 10,1000 --baseline bench.json
+#
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_dcos import FakeDcos, FakeDcosServer
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESOURCES = ['users', 'groups', 'acls', 'secrets', 'packages', 'apps']
+MODES = ['loop', 'bulk']
+PHASES = ['create', 'converge']
+BENCH_UID = 'bench'
+
+
+def _users(size):
+    return [{'uid': 'user{}'.format(i), 'description': 'user {}'.format(i),
+             'password': 'fooBar123ASDF'} for i in range(size)]
+
+
+def _groups(size):
+    return [{'gid': 'group{}'.format(i), 'description': 'group {}'.format(i)}
+            for i in range(size)]
+
+
+def _acls(size):
+    return [{'rid': 'dcos:bench:{}'.format(i), 'description': 'acl {}'.format(i)}
+            for i in range(size)]
+
+
+def _secrets(size):
+    return dict(('bench/secret{}'.format(i), 'value {}'.format(i)) for i in range(size))
+
+
+def _packages(size):
+    return [{'package': 'hello-world', 'app_id': '/bench/hello{}'.format(i),
+             'options': {'service': {'name': 'bench/hello{}'.format(i)}}}
+            for i in range(size)]
+
+
+def _apps(size):
+    return [{'id': '/bench/app{}'.format(i), 'cmd': 'sleep 3600', 'instances': 1,
+             'cpus': 0.1, 'mem': 32} for i in range(size)]
+
+
+def _loop(module, args, items):
+    return {module: args, 'with_items': items}
+
+
+def scenario(resource, mode, size, concurrency):
+    # the tasks of the playbook for one resource, mode and size
+    if resource == 'users':
+        if mode == 'bulk':
+            return [{'dcos_iam_state': {'users': _users(size), 'concurrency': concurrency}}]
+        return [_loop('dcos_user', {'uid': '{{ item.uid }}', 'description': '{{ item.description }}',
+                                    'password': '{{ item.password }}'}, _users(size))]
+    if resource == 'groups':
+        if mode == 'bulk':
+            return [{'dcos_iam_state': {'groups': _groups(size), 'concurrency': concurrency}}]
+        return [_loop('dcos_group', {'gid': '{{ item.gid }}', 'description': '{{ item.description }}'},
+                      _groups(size))]
+    if resource == 'acls':
+        acls = _acls(size)
+        if mode == 'bulk':
+            for acl in acls:
+                acl['users'] = {BENCH_UID: ['read']}
+            return [{'dcos_iam_state': {'acls': acls, 'concurrency': concurrency}}]
+        return [_loop('dcos_acl', {'rid': '{{ item.rid }}', 'description': '{{ item.description }}'}, acls),
+                _loop('dcos_acl_user', {'rid': '{{ item.rid }}', 'uid': BENCH_UID,
+                                        'permission': 'read'}, acls)]
+    if resource == 'secrets':
+        secrets = _secrets(size)
+        if mode == 'bulk':
+            return [{'dcos_secrets': {'prefix': 'bench', 'secrets': secrets,
+                                      'concurrency': concurrency}}]
+        return [_loop('dcos_secret', {'path': '{{ item.key }}', 'value': '{{ item.value }}'},
+                      [{'key': k, 'value': v} for k, v in sorted(secrets.items())])]
+    if resource == 'packages':
+        if mode == 'bulk':
+            return [{'dcos_packages': {'packages': _packages(size), 'concurrency': concurrency}}]
+        return [_loop('dcos_package', {'package': '{{ item.package }}', 'app_id': '{{ item.app_id }}',
+                                       'options': '{{ item.options }}'}, _packages(size))]
+    if resource == 'apps':
+        if mode == 'bulk':
+            return [{'dcos_marathon_group': {'group': {'id': '/bench', 'apps': _apps(size)}}}]
+        return [_loop('dcos_marathon_app', {'app': '{{ item }}'}, _apps(size))]
+    raise ValueError('Unknown resource {}'.format(resource))
+
+
+def seed(dcos, resource):
+    # objects the scenario expects to exist already
+    if resource == 'acls':
+        dcos.handle('PUT', '/acs/api/v1/users/' + BENCH_UID, {}, {'description': BENCH_UID})
+
+
+class Bench:
+    def __init__(self, args):
+        self.args = args
+        self.dcos = FakeDcos(args.latency, args.jitter, args.error_rate, args.error_status)
+        self.server = FakeDcosServer(self.dcos)
+        self.workdir = tempfile.mkdtemp(prefix='dcos-bench-')
+        home = os.path.join(self.workdir, 'home')
+        os.makedirs(os.path.join(home, '.dcos'))
+        with open(os.path.join(home, '.dcos', 'dcos.toml'), 'w') as f:
+            f.write('[core]\ndcos_url = "{}"\ndcos_acs_token = "fake"\n'.format(self.server.url))
+        self.env = dict(os.environ,
+                        HOME=home,
+                        ANSIBLE_LIBRARY=os.path.join(ROOT, 'ansible', 'modules', 'dcos'),
+                        ANSIBLE_MODULE_UTILS=os.path.join(ROOT, 'ansible', 'module_utils'),
+                        ANSIBLE_RETRY_FILES_ENABLED='False',
+                        ANSIBLE_LOCAL_TEMP=os.path.join(self.workdir, 'ansible'))
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def playbook(self, name, tasks):
+        path = os.path.join(self.workdir, name + '.yml')
+        with open(path, 'w') as f:
+            # json is valid yaml
+            json.dump([{'hosts': 'localhost', 'connection': 'local',
+                        'gather_facts': False, 'tasks': tasks}], f)
+        return path
+
+    def run_playbook(self, path):
+        # circuit breaker and leader state must not carry over from one
+        # scenario to the next
+        shutil.rmtree(os.path.join(self.env['HOME'], '.dcos', 'state'), ignore_errors=True)
+        env = dict(self.env, TMPDIR=tempfile.mkdtemp(dir=self.workdir))
+        with open(os.devnull, 'w') as devnull:
+            start = time.time()
+            rc = subprocess.call([self.args.ansible_playbook, path], env=env,
+                                 stdout=None if self.args.verbose else devnull)
+            return rc, time.time() - start
+
+    def run(self, resource, mode, size):
+        tasks = scenario(resource, mode, size, self.args.concurrency)
+        path = self.playbook('{}-{}-{}'.format(resource, mode, size), tasks)
+        task_count = sum(len(task.get('with_items', [None])) for task in tasks)
+        self.dcos.reset()
+        seed(self.dcos, resource)
+        results = []
+        for phase in PHASES:
+            before = self.dcos.stats()
+            rc, wall = self.run_playbook(path)
+            after = self.dcos.stats()
+            requests = after['requests'] - before['requests']
+            results.append({
+                'resource': resource,
+                'mode': mode,
+                'size': size,
+                'phase': phase,
+                'rc': rc,
+                'wall': wall,
+                'tasks': task_count,
+                'tasks_per_sec': task_count / wall if wall else 0,
+                'objects_per_sec': size / wall if wall else 0,
+                'requests': requests,
+                'requests_per_object': float(requests) / size if size else 0,
+                'errors': after['errors'] - before['errors'],
+            })
+        return results
+
+
+def _key(result):
+    return (result['resource'], result['mode'], result['size'], result['phase'])
+
+
+def print_results(results):
+    print '{:<10} {:<5} {:>6} {:<9} {:>3} {:>9} {:>7} {:>10} {:>12} {:>9} {:>8}'.format(
+        'resource', 'mode', 'size', 'phase', 'rc', 'wall', 'tasks', 'tasks/s',
+        'objects/s', 'requests', 'req/obj')
+    for r in results:
+        print '{resource:<10} {mode:<5} {size:>6} {phase:<9} {rc:>3} {wall:>9.2f} {tasks:>7} ' \
+              '{tasks_per_sec:>10.1f} {objects_per_sec:>12.1f} {requests:>9} ' \
+              '{requests_per_object:>8.2f}'.format(**r)
+
+
+def regressions(results, baseline, tolerance):
+    # runs slower than the baseline by more than tolerance, or that send
+    # more requests than it did
+    previous = dict((_key(r), r) for r in baseline)
+    found = []
+    for result in results:
+        old = previous.get(_key(result))
+        if not old:
+            continue
+        if result['wall'] > old['wall'] * (1 + tolerance):
+            found.append('{} wall time {:.2f}s, was {:.2f}s'.format(
+                '/'.join(map(str, _key(result))), result['wall'], old['wall']))
+        if result['requests'] > old['requests']:
+            found.append('{} sent {} requests, was {}'.format(
+                '/'.join(map(str, _key(result))), result['requests'], old['requests']))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the DC/OS modules against a fake cluster')
+    parser.add_argument('--sizes', default='10,1000,10000',
+                        help='comma separated numbers of objects')
+    parser.add_argument('--resources', default=','.join(RESOURCES))
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--loop-limit', type=int, default=1000,
+                        help='skip loop runs larger than this, every object is an ansible task')
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--ansible-playbook', default='ansible-playbook')
+    parser.add_argument('--output', help='write the results as json to this file')
+    parser.add_argument('--baseline', help='compare against the results in this file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed wall time increase over the baseline')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    bench = Bench(args)
+    bench.server.start()
+    results = []
+    try:
+        for resource in args.resources.split(','):
+            for mode in args.modes.split(','):
+                for size in [int(s) for s in args.sizes.split(',')]:
+                    if mode == 'loop' and size > args.loop_limit:
+                        continue
+                    results.extend(bench.run(resource, mode, size))
+    finally:
+        bench.close()
+
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    failed = [r for r in results if r['rc'] != 0]
+    if failed:
+        print '{} runs failed'.format(len(failed))
+    found = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print 'REGRESSION: ' + line
+    sys.exit(1 if failed or found else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,11 @@
 ansible-playbook -v functional/test_user.yml
 ansible-playbook -v functional/test_group.yml
 ansible-playbook -v functional/test_acl.yml
+ansible-playbook -v functional/test_iam_state.yml
+ansible-playbook -v functional/test_secrets.yml
+ansible-playbook -v functional/test_iam_facts.yml
+ansible-playbook -v functional/test_iam_export.yml
+ansible-playbook -v functional/test_packages.yml
+ansible-playbook -v functional/test_marathon_app.yml
+ansible-playbook -v functional/test_marathon_group.yml
+ansible-playbook -v functional/test_broker.yml
@@ -5,6 +5,9 @@ py_files=[
     "ansible/module_utils/dcos",
     "ansible/plugins/lookup/dcos_token",
     "ansible/plugins/lookup/dcos_token_header",
+    "ansible/plugins/lookup/dcos_secret",
+    "ansible/plugins/callback/dcos_perf",
+    "ansible/plugins/inventory/dcos_inventory",
 ]
 files = [
     "ansible/modules/dcos",
@@ -28,4 +31,7 @@ setup(
         'dcoscli>=0.4.5',
         'toml',
     ],
+    extras_require = {
+        'service-account': ['PyJWT', 'cryptography'],
+    },
 )